@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Places Leisure feed client and availability checker
+
+Times each stage of a check - fetch_all_slots pagination,
+filter_squash_slots_by_time (by scan and through a SlotIndex),
+filter_squash_slots_by_windows, a week's availability_grid,
+get_squash_court_availability and a full check_availability_programmatic
+call - against a synthetic or recorded feed served by a local stub RPDE
+server, so the numbers don't depend on (or load) the real operator. Results
+are written as JSON so runs from different versions can be compared.
+
+Usage:
+    python benchmark.py suite --facilities 50 --days 14 --output bench.json
+    python benchmark.py suite --recording recordings/2026-02-03 --compare bench.json
+    python benchmark.py prefetch --pages 50 --page-size 500 --latency 0.05
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from check_squash_availability import (
+    PlacesLeisureAPI, SQLiteSlotStore, SlotStore, SquashAvailabilityChecker,
+    SQUASH_FACILITY_IDS, check_availability_programmatic, facility_id_of
+)
+from rpde_stub_server import StubFeed, recorded_items, start_stub_server
+from synthetic_feed import generate_slots
+
+
+def measure(stage: Callable[[], object], repeat: int) -> Dict:
+    """Time a stage `repeat` times, then run it once more under tracemalloc.
+
+    allocated_blocks is the number of memory blocks the stage left allocated
+    (mostly its result); peak_bytes is the most memory it had in use at once.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = stage()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    allocated_blocks = sum(max(stat.count_diff, 0) for stat in after.compare_to(before, 'filename'))
+    del result
+
+    return {
+        'runs': repeat,
+        'best_s': round(min(timings), 6),
+        'median_s': round(statistics.median(timings), 6),
+        'peak_bytes': peak,
+        'allocated_blocks': allocated_blocks
+    }
+
+
+def query_windows(open_time: str = "07:00", close_time: str = "22:00", minutes: int = 40) -> List[Tuple[str, str]]:
+    """(start, end) HH:MM windows covering a day, one per slot length"""
+    windows = []
+    current = datetime.strptime(open_time, "%H:%M")
+    close = datetime.strptime(close_time, "%H:%M")
+    while current + timedelta(minutes=minutes) <= close:
+        end = current + timedelta(minutes=minutes)
+        windows.append((current.strftime("%H:%M"), end.strftime("%H:%M")))
+        current = end
+    return windows
+
+
+def first_squash_date(items: List[Dict]) -> Optional[str]:
+    """Date of the earliest squash slot in a feed, for querying recorded feeds"""
+    dates = [
+        item['data']['startDate'][:10] for item in items
+        if item.get('data') and facility_id_of(item['data'].get('facilityUse', '')) in SQUASH_FACILITY_IDS
+    ]
+    return min(dates) if dates else None
+
+
+def git_version() -> Optional[str]:
+    """Current commit, so results can be tied to a version"""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(items: List[Dict], target_date: str, repeat: int, page_size: int, latency: float) -> Dict:
+    """Benchmark every stage against a stub server serving `items`"""
+    # The crawl must reach the end of even very large synthetic feeds
+    PlacesLeisureAPI.MAX_PAGES = max(PlacesLeisureAPI.MAX_PAGES, len(items) // page_size + 10)
+
+    server = start_stub_server(StubFeed(items, page_size=page_size, latency=latency))
+    try:
+        checker = SquashAvailabilityChecker(base_url=server.url)
+        windows = query_windows()
+        stages = {}
+
+        # Pagination of the whole feed, keeping every item
+        def fetch_all() -> List[Dict]:
+            return PlacesLeisureAPI(base_url=server.url).fetch_all_slots()
+
+        # Pagination with the checker's facility pre-filter
+        def fetch_prefiltered() -> List[Dict]:
+            return PlacesLeisureAPI(base_url=server.url, facility_ids=checker.facility_ids).fetch_all_slots()
+
+        stages['fetch_all_slots'] = measure(fetch_all, repeat)
+        stages['fetch_all_slots_prefiltered'] = measure(fetch_prefiltered, repeat)
+
+        # Filtering and aggregation run on the unfiltered feed, the worst case
+        slots = fetch_all()
+        filtered = [checker.filter_squash_slots_by_time(slots, target_date, start, end) for start, end in windows]
+
+        stages['filter_squash_slots_by_time'] = measure(
+            lambda: [checker.filter_squash_slots_by_time(slots, target_date, start, end) for start, end in windows],
+            repeat
+        )
+        stages['filter_squash_slots_by_windows'] = measure(
+            lambda: checker.filter_squash_slots_by_windows(slots, target_date, windows), repeat
+        )
+        stages['build_index'] = measure(lambda: checker.build_index(slots), repeat)
+        index = checker.build_index(slots)
+        stages['filter_squash_slots_by_time_indexed'] = measure(
+            lambda: [checker.filter_squash_slots_by_time(index, target_date, start, end) for start, end in windows],
+            repeat
+        )
+        stages['availability_grid_7_days'] = measure(lambda: checker.availability_grid(target_date, 7, slots), repeat)
+        stages['get_squash_court_availability'] = measure(
+            lambda: [checker.get_squash_court_availability(window_slots) for window_slots in filtered],
+            repeat
+        )
+        stages['check_availability_programmatic'] = measure(
+            lambda: check_availability_programmatic(target_date, windows[len(windows) // 2][0], base_url=server.url),
+            repeat
+        )
+    finally:
+        server.shutdown()
+
+    return {
+        'feed': {
+            'items': len(items),
+            'page_size': page_size,
+            'latency_s': latency,
+            'target_date': target_date,
+            'windows': len(windows),
+            'squash_slots_on_date': sum(len(window_slots) for window_slots in filtered)
+        },
+        'stages': stages
+    }
+
+
+def compare_results(previous: Dict, current: Dict) -> Dict:
+    """Ratio of current to previous best time for each stage (above 1 is slower)"""
+    ratios = {}
+    for stage, result in current['stages'].items():
+        old = previous.get('stages', {}).get(stage)
+        if old and old.get('best_s'):
+            ratios[stage] = round(result['best_s'] / old['best_s'], 3)
+    return ratios
+
+
+def time_fetch(base_url: str, store_kind: str, prefetch: bool, repeat: int) -> float:
+    """Best wall-clock time for a cold fetch_all_slots into the given store kind"""
+    best = float('inf')
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            if store_kind == 'sqlite':
+                store = SQLiteSlotStore(os.path.join(tmp_dir, 'slots.db'))
+            else:
+                store = SlotStore()
+            api = PlacesLeisureAPI(store=store, prefetch=prefetch, base_url=base_url)
+
+            start = time.perf_counter()
+            api.fetch_all_slots()
+            best = min(best, time.perf_counter() - start)
+
+            if store_kind == 'sqlite':
+                store.conn.close()
+    return best
+
+
+def bench_prefetch(pages: int, page_size: int, latency: float, repeat: int) -> List[Dict]:
+    """Compare sequential and pipelined pagination against the stub feed.
+
+    Prefetching overlaps the next download with the work done on the current
+    page, so the gain grows with how much the page consumer does: it is
+    small for the in-memory store and larger for the SQLite store.
+    """
+    items = list(generate_slots(days=None, limit=pages * page_size))
+    feed = StubFeed(items, page_size=page_size, latency=latency)
+    server = start_stub_server(feed)
+    base_url = server.url
+    results = []
+    try:
+        # Warm the stub's encoded pages so both modes see the same server cost
+        time_fetch(base_url, 'memory', prefetch=False, repeat=1)
+
+        for store_kind in ('memory', 'sqlite'):
+            sequential = time_fetch(base_url, store_kind, prefetch=False, repeat=repeat)
+            pipelined = time_fetch(base_url, store_kind, prefetch=True, repeat=repeat)
+            results.append({
+                'benchmark': 'prefetch',
+                'store': store_kind,
+                'pages': pages,
+                'page_size': page_size,
+                'latency_s': latency,
+                'sequential_s': round(sequential, 4),
+                'pipelined_s': round(pipelined, 4),
+                'speedup': round(sequential / pipelined, 2) if pipelined else None
+            })
+    finally:
+        server.shutdown()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Places Leisure feed client against a local stub feed')
+    parser.add_argument('command', nargs='?', choices=['suite', 'prefetch'], default='suite',
+                        help='suite times every stage (default); prefetch compares pipelined pagination')
+    parser.add_argument('--facilities', type=int, default=50, help='Facilities in the synthetic feed (default: 50)')
+    parser.add_argument('--days', type=int, default=14, help='Days in the synthetic feed (default: 14)')
+    parser.add_argument('--start-date', default='2026-02-03', help='First day of the synthetic feed (default: 2026-02-03)')
+    parser.add_argument('--recording', metavar='DIR', help='Benchmark a feed saved with --record instead of a synthetic one')
+    parser.add_argument('--date', help='Date to query (default: the first day with squash slots)')
+    parser.add_argument('--pages', type=int, default=50, help='Pages for the prefetch benchmark (default: 50)')
+    parser.add_argument('--page-size', type=int, default=500, help='Items per page (default: 500)')
+    parser.add_argument('--latency', type=float, help='Stub response delay per page, in seconds (default: 0 for suite, 0.05 for prefetch)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage (default: 3)')
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    parser.add_argument('--compare', metavar='JSON', help='Earlier suite results to compare against')
+
+    args = parser.parse_args()
+
+    if args.command == 'prefetch':
+        latency = 0.05 if args.latency is None else args.latency
+        result = bench_prefetch(args.pages, args.page_size, latency, args.repeat)
+    else:
+        if args.recording:
+            items = recorded_items(args.recording)
+            source = {'source': 'recording', 'recording': args.recording}
+        else:
+            start_date = datetime.strptime(args.start_date, "%Y-%m-%d").date()
+            items = list(generate_slots(facilities=args.facilities, days=args.days, start_date=start_date))
+            source = {'source': 'synthetic', 'facilities': args.facilities, 'days': args.days}
+
+        target_date = args.date or first_squash_date(items) or date.today().isoformat()
+        result = run_suite(items, target_date, args.repeat, args.page_size, args.latency or 0.0)
+        result['feed'].update(source)
+        result = {
+            'version': git_version(),
+            'python': platform.python_version(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            **result
+        }
+
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                result['compared_to'] = {'file': args.compare, 'ratios': compare_results(json.load(f), result)}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,81 +3,1226 @@
 Squash Court Availability Checker for Places Leisure
 
 This script specifically checks squash court availability at Places Leisure facilities.
-It checks 40-minute slots and the 40 minutes before each slot.
+It checks 40-minute slots and the 40 minutes before each slot. The slot length
+and the number of slots checked before and after are configurable.
 
 Usage:
     python check_squash_availability.py --date 2026-02-03 --start-time 10:00
+    python check_squash_availability.py snapshot --snapshot slots.snap
 """
 
+import os
 import sys
+import bisect
+import calendar
+import time
+import gzip
+import lzma
+import random
+import hashlib
+import heapq
+import itertools
+import sqlite3
+import zlib
+import asyncio
 import requests
 import argparse
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import aiohttp
+except ImportError:  # Only needed for AsyncPlacesLeisureAPI
+    aiohttp = None
+
+# Squash facility identifiers for Alfreton Leisure Centre
+SQUASH_FACILITY_IDS = [
+    "041A000005"   # Alfreton Leisure Centre Squash
+]
+
+# Slot fields read by the availability code; everything else is dropped when
+# the feed is pre-filtered
+PROJECTED_SLOT_FIELDS = (
+    'identifier', 'facilityUse', 'startDate', 'endDate',
+    'remainingUses', 'offers', 'beta:sportsActivityLocation'
+)
+
+# First bytes of a slot snapshot file, bumped if the layout ever changes
+SNAPSHOT_MAGIC = b'SQUASHSNAP2\n'
+
+# Headers sent with every feed request, by both the requests and aiohttp clients
+REQUEST_HEADERS = {'User-Agent': 'SquashCourtChecker/1.0'}
+
+# HTTP statuses worth retrying; other 4xx responses won't change on retry
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+class FeedError(Exception):
+    """Raised when a page of the live slots feed cannot be fetched.
+    
+    `url` is the page that failed, so pagination can resume from it.
+    """
+    
+    def __init__(self, message: str, url: str):
+        super().__init__(message)
+        self.url = url
+
+class FeedConnectionError(FeedError):
+    """The feed could not be reached (network error or timeout)"""
+
+class FeedHTTPError(FeedError):
+    """The feed answered with an error status"""
+    
+    def __init__(self, message: str, url: str, status: int):
+        super().__init__(message, url)
+        self.status = status
+
+class FeedDecodeError(FeedError):
+    """The feed answered with something that isn't JSON"""
+
+def feed_seconds(timestamp: str) -> int:
+    """Seconds since the epoch of a feed timestamp, taking the time as written (the feed publishes UTC)"""
+    return calendar.timegm(datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timetuple())
+
+def slot_times(slot_item: Dict) -> Optional[Tuple[int, int]]:
+    """Return a slot's (start, end) in epoch seconds, or None if it has no valid times.
+    
+    The times are parsed once and kept on the item under `_start` and `_end`,
+    so stored slots are never parsed again.
+    """
+    if '_start' not in slot_item:
+        slot_data = slot_item.get('data') or {}
+        try:
+            slot_item['_start'] = feed_seconds(slot_data['startDate'])
+            slot_item['_end'] = feed_seconds(slot_data['endDate'])
+        except (KeyError, TypeError, ValueError, AttributeError):
+            slot_item['_start'] = slot_item['_end'] = None
+    
+    if slot_item['_start'] is None:
+        return None
+    return slot_item['_start'], slot_item['_end']
+
+def facility_id_of(facility_use: str) -> str:
+    """Extract the facility identifier from a slot's facilityUse URL"""
+    return facility_use.split('/')[-1] if '/' in facility_use else facility_use
+
+def slot_facility(slot_item: Dict) -> Optional[str]:
+    """Return a slot's facility identifier, extracted once and kept on the item under `_facility`"""
+    if '_facility' not in slot_item:
+        slot_data = slot_item.get('data') or {}
+        facility_use = slot_data.get('facilityUse')
+        slot_item['_facility'] = facility_id_of(facility_use) if isinstance(facility_use, str) else None
+    return slot_item['_facility']
+
+class SlotStore:
+    """In-memory store of feed items keyed by RPDE id.
+    
+    Only the highest `modified` version of each item is kept and items with
+    state "deleted" are dropped, as described by the RPDE spec. When a path is
+    given the store and its checkpoint are loaded from and saved to a JSON file.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.checkpoint: Optional[str] = None
+        self._items: Dict[str, Dict] = {}
+        self.listeners: List[Callable[[Optional[Dict], Optional[Dict]], None]] = []
+        
+        if path:
+            self.load()
+    
+    def add_listener(self, listener: Callable[[Optional[Dict], Optional[Dict]], None]):
+        """Call listener(old_item, new_item) whenever a stored item is added, replaced or removed.
+        
+        old_item is None for new items and new_item is None for removals.
+        """
+        self.listeners.append(listener)
+    
+    def notify(self, old_item: Optional[Dict], new_item: Optional[Dict]):
+        """Tell the listeners about a change to the stored items"""
+        for listener in self.listeners:
+            listener(old_item, new_item)
+    
+    @staticmethod
+    def modified_key(item: Dict):
+        """Return a comparable form of an item's `modified` value"""
+        modified = item.get('modified', 0)
+        try:
+            return int(modified)
+        except (TypeError, ValueError):
+            return modified
+    
+    def upsert(self, item: Dict):
+        """Insert or replace an item if it is at least as new as the stored one"""
+        item_id = item.get('id')
+        if item_id is None:
+            return
+        
+        existing = self._items.get(item_id)
+        if existing is not None and self.modified_key(existing) > self.modified_key(item):
+            return
+        
+        if item.get('state') == 'deleted':
+            self._items.pop(item_id, None)
+            if existing is not None:
+                self.notify(existing, None)
+        else:
+            self._items[item_id] = item
+            self.notify(existing, item)
+    
+    def apply_page(self, items: List[Dict]):
+        """Apply every item from one RPDE page"""
+        for item in items:
+            self.upsert(item)
+    
+    def slots(self) -> List[Dict]:
+        """Return the current version of every live item"""
+        return list(self._items.values())
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def load(self):
+        """Load the checkpoint and items from the JSON state file"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable state file {self.path}: {e}")
+            return
+        
+        self.checkpoint = state.get('next_url')
+        self.apply_page(state.get('items', []))
+    
+    def save(self):
+        """Persist the checkpoint and items to the JSON state file"""
+        if not self.path:
+            return
+        
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        
+        # Write to a temporary file first so an interrupted run never leaves
+        # a half-written state file behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'next_url': self.checkpoint, 'items': self.slots()}, f)
+        os.replace(tmp_path, self.path)
+    
+    def write_snapshot(self, path: str):
+        """Write the compacted slots and checkpoint to a compressed JSON snapshot file"""
+        payload = json.dumps({'next_url': self.checkpoint, 'items': self.slots()}).encode('utf-8')
+        
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(zlib.compress(payload))
+        os.replace(tmp_path, path)
+    
+    def load_snapshot(self, path: str):
+        """Load slots and the checkpoint from a snapshot written by write_snapshot.
+        
+        Snapshots are plain JSON, so a file copied from another host can only
+        ever contain data.
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a slot snapshot")
+            state = json.loads(zlib.decompress(f.read()))
+        
+        self.apply_page(state['items'])
+        self.checkpoint = state['next_url']
+        self.save()
+
+class SQLiteSlotStore(SlotStore):
+    """Slot store backed by an SQLite database, for feeds too large to keep as JSON"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.listeners = []
+        # AsyncPlacesLeisureAPI writes to the store from its I/O thread, one
+        # call at a time, so the connection may not stay on this thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS slots (id TEXT PRIMARY KEY, modified, item TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.conn.commit()
+    
+    @property
+    def checkpoint(self) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'next_url'").fetchone()
+        return row[0] if row else None
+    
+    @checkpoint.setter
+    def checkpoint(self, value: Optional[str]):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('next_url', ?)", (value,)
+        )
+    
+    def upsert(self, item: Dict):
+        """Insert or replace an item if it is at least as new as the stored one"""
+        item_id = item.get('id')
+        if item_id is None:
+            return
+        
+        modified = self.modified_key(item)
+        
+        # Listeners need the replaced item, which costs a lookup
+        existing = None
+        if self.listeners:
+            row = self.conn.execute("SELECT item FROM slots WHERE id = ?", (str(item_id),)).fetchone()
+            existing = json.loads(row[0]) if row else None
+        
+        if item.get('state') == 'deleted':
+            cursor = self.conn.execute(
+                "DELETE FROM slots WHERE id = ? AND modified <= ?", (str(item_id), modified)
+            )
+            if existing is not None and cursor.rowcount:
+                self.notify(existing, None)
+        else:
+            cursor = self.conn.execute(
+                "INSERT INTO slots (id, modified, item) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET modified = excluded.modified, item = excluded.item "
+                "WHERE excluded.modified >= slots.modified",
+                (str(item_id), modified, json.dumps(item))
+            )
+            if cursor.rowcount:
+                self.notify(existing, item)
+    
+    def slots(self) -> List[Dict]:
+        """Return the current version of every live item"""
+        return [json.loads(row[0]) for row in self.conn.execute("SELECT item FROM slots")]
+    
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+    
+    def load(self):
+        """Nothing to do - the database is read on demand"""
+    
+    def save(self):
+        """Commit pending changes to the database"""
+        self.conn.commit()
+
+class PageCache:
+    """On-disk cache of RPDE pages keyed by a hash of their URL.
+    
+    Only pages that have a different `next` page are stored. Those are
+    effectively immutable, while the tail page is always fetched again. The
+    least recently used pages are evicted once the cache grows past max_bytes.
+    """
+    
+    COMPRESSORS = {
+        None: ('.json', lambda body: body, lambda body: body),
+        'gzip': ('.json.gz', gzip.compress, gzip.decompress),
+        'lzma': ('.json.xz', lzma.compress, lzma.decompress)
+    }
+    
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024,
+                 compression: Optional[str] = None):
+        if compression not in self.COMPRESSORS:
+            raise ValueError(f"Unknown compression {compression!r}, expected gzip or lzma")
+        
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix, self.compress, self.decompress = self.COMPRESSORS[compression]
+        self._size: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+    
+    def path_for(self, url: str) -> str:
+        """Cache file path for a page URL"""
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + self.suffix)
+    
+    def get(self, url: str) -> Optional[bytes]:
+        """Return the cached body for a URL, or None if it isn't cached"""
+        path = self.path_for(url)
+        try:
+            with open(path, 'rb') as f:
+                body = self.decompress(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, lzma.LZMAError, zlib.error) as e:
+            # Drop the entry so the page is fetched and cached again
+            print(f"Warning: Removing unreadable cache entry {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._size = None
+            return None
+        
+        # Touch the file so eviction treats it as recently used
+        os.utime(path)
+        return body
+    
+    def put(self, url: str, body: bytes):
+        """Store the body of an immutable page"""
+        path = self.path_for(url)
+        data = self.compress(body)
+        
+        # Sized before writing, so a replaced entry only adds the difference
+        size = self.size()
+        try:
+            size -= os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+        
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        
+        self._size = size + len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+    
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """Return (mtime, size, path) for every cached page"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def size(self) -> int:
+        """Total bytes used by the cache"""
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self.entries())
+        return self._size
+    
+    def evict(self):
+        """Delete least recently used pages until the cache fits in max_bytes"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        
+        self._size = total
+
+class FeedRecording:
+    """Directory of raw feed pages, written by --record and served back by --replay.
+    
+    Pages are stored as numbered JSON files, with an index.json mapping each
+    page URL to its file in the order the pages were received.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        self.pages: List[Dict] = []
+        self.files: Dict[str, str] = {}
+        
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.pages = json.load(f).get('pages', [])
+            self.files = {page['url']: page['file'] for page in self.pages}
+    
+    def first_url(self) -> Optional[str]:
+        """URL of the first recorded page, where a replay starts"""
+        return self.pages[0]['url'] if self.pages else None
+    
+    def record(self, url: str, body: bytes, save_index: bool = True):
+        """Save one page body, replacing any earlier recording of the same URL.
+        
+        Bulk writers can pass save_index=False and call save_index() once at the end.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        
+        file_name = self.files.get(url)
+        if file_name is None:
+            file_name = f"page-{len(self.pages) + 1:06d}.json"
+            self.pages.append({'url': url, 'file': file_name})
+            self.files[url] = file_name
+        
+        with open(os.path.join(self.directory, file_name), 'wb') as f:
+            f.write(body)
+        
+        # Rewrite the index after every page so an interrupted recording is usable
+        if save_index:
+            self.save_index()
+    
+    def save_index(self):
+        """Write index.json for the pages recorded so far"""
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pages': self.pages}, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+    
+    def load(self, url: str) -> Optional[bytes]:
+        """Return the recorded body for a URL, or None if it wasn't recorded"""
+        file_name = self.files.get(url)
+        if file_name is None:
+            return None
+        
+        with open(os.path.join(self.directory, file_name), 'rb') as f:
+            return f.read()
+
+def open_slot_store(path: Optional[str] = None) -> SlotStore:
+    """Open a slot store, using SQLite for .db/.sqlite paths and JSON otherwise"""
+    if path and path.endswith(('.db', '.sqlite', '.sqlite3')):
+        return SQLiteSlotStore(path)
+    return SlotStore(path)
 
 class PlacesLeisureAPI:
     """Interface to the Places Leisure OpenActive API"""
     
     BASE_URL = "https://opendata.leisurecloud.live/api/feeds/PlacesLeisure-live-slots"
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'SquashCourtChecker/1.0'
-        })
+    # Safety limit on pages per crawl, to prevent infinite loops
+    MAX_PAGES = 1000
+    
+    def __init__(self, checkpoint_path: Optional[str] = None, store: Optional['SlotStore'] = None,
+                 facility_ids: Optional[List[str]] = None, prefetch: bool = False,
+                 max_retries: int = 3, backoff: float = 1.0,
+                 page_cache: Optional[PageCache] = None, recording: Optional[FeedRecording] = None,
+                 replay: Optional[FeedRecording] = None, base_url: Optional[str] = None):
+        self.session = self.open_session()
+        # The store keeps the latest version of every slot plus the RPDE
+        # checkpoint (last `next` URL). With a checkpoint path it is persisted
+        # between runs; otherwise it only lives for this client.
+        self.store = store if store is not None else open_slot_store(checkpoint_path)
+        # When set, only items for these facilities are kept from each page
+        self.facility_ids = facility_ids
+        self.facility_set = set(facility_ids) if facility_ids is not None else None
+        # Fetch the next page on a background thread while the current one is processed
+        self.prefetch = prefetch
+        # Each page is retried up to max_retries times with jittered exponential backoff
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # Serves pages that can no longer change from disk instead of the network
+        self.page_cache = page_cache
+        # Every page received is saved to `recording`; with `replay` set, pages
+        # come only from that recording and the network is never used
+        self.recording = recording
+        self.replay = replay
+        if replay is not None and checkpoint_path:
+            raise ValueError("A replay always starts from its first recorded page, so it can't use a checkpoint file")
+        
+        # Point the client at another feed, e.g. a local rpde_stub_server.py
+        if base_url:
+            self.BASE_URL = base_url
+        if replay is not None and replay.first_url():
+            self.BASE_URL = replay.first_url()
+    
+    def open_session(self) -> Optional[requests.Session]:
+        """Create the HTTP session used by fetch_slots"""
+        session = requests.Session()
+        session.headers.update(REQUEST_HEADERS)
+        return session
+    
+    def retry_delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number `attempt` (0-based), with full jitter"""
+        return random.uniform(0, min(30.0, self.backoff * (2 ** attempt)))
+    
+    def status_error(self, url: str, status: int) -> Optional[FeedHTTPError]:
+        """Return the error for a bad status, raising it straight away if retrying won't help"""
+        if status < 400:
+            return None
+        
+        error = FeedHTTPError(f"Error fetching slots from {url}: HTTP {status}", url, status)
+        if status not in RETRYABLE_STATUS_CODES:
+            raise error
+        return error
+    
+    def is_immutable_page(self, data: Dict, url: str) -> bool:
+        """Check if a page has a following page, so its contents are final"""
+        next_page_url = data.get('next')
+        return bool(data.get('items')) and bool(next_page_url) and next_page_url != url
+    
+    def local_page(self, url: str) -> Optional[Dict]:
+        """Return a page without using the network, from the replay recording or the page cache"""
+        if self.replay is not None:
+            body = self.replay.load(url)
+            if body is None:
+                raise FeedError(f"{url} is not in the recording at {self.replay.directory}", url)
+        elif self.page_cache is not None:
+            body = self.page_cache.get(url)
+            if body is None:
+                return None
+        else:
+            return None
+        
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            if self.replay is not None:
+                raise FeedDecodeError(f"Invalid JSON recorded for {url}: {e}", url)
+            return None
+        
+        if self.recording is not None:
+            self.recording.record(url, body)
+        return data
+    
+    def received_page(self, url: str, data: Dict, body: bytes):
+        """Record a page fetched from the network and cache it if it can't change any more"""
+        if self.recording is not None:
+            self.recording.record(url, body)
+        if self.page_cache is not None and self.is_immutable_page(data, url):
+            self.page_cache.put(url, body)
     
     def fetch_slots(self, after_url: Optional[str] = None) -> Dict:
-        """Fetch slots from the API"""
+        """Fetch slots from the API, retrying transient failures.
+        
+        Raises a FeedError subclass once the retries are used up.
+        """
         url = after_url or self.BASE_URL
         
+        cached = self.local_page(url)
+        if cached is not None:
+            return cached
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.get(url, timeout=30)
+                error = self.status_error(url, response.status_code)
+                if error is None:
+                    # Not response.json(): its JSONDecodeError is also a
+                    # RequestException, which would hide decode errors
+                    data = json.loads(response.content)
+                    self.received_page(url, data, response.content)
+                    return data
+            except requests.exceptions.RequestException as e:
+                error = FeedConnectionError(f"Error fetching slots from {url}: {e}", url)
+            except ValueError as e:
+                # Usually a truncated body, so worth another try
+                error = FeedDecodeError(f"Invalid JSON from {url}: {e}", url)
+            
+            if attempt < self.max_retries:
+                delay = self.retry_delay(attempt)
+                print(f"Warning: {error} - retrying in {delay:.1f}s")
+                time.sleep(delay)
+        
+        raise error
+    
+    def prefilter_items(self, items: List[Dict]) -> List[Dict]:
+        """Drop items for other facilities and project the rest to the fields we use.
+        
+        Deleted items carry no facility information, so they are always kept
+        (they are tiny) to let the slot store remove slots it already holds.
+        """
+        if self.facility_ids is None:
+            return items
+        
+        kept = []
+        for item in items:
+            slot_data = item.get('data')
+            if not slot_data:
+                if item.get('state') == 'deleted':
+                    kept.append({key: item[key] for key in ('id', 'state', 'kind', 'modified') if key in item})
+                continue
+            
+            facility_id = facility_id_of(slot_data.get('facilityUse', ''))
+            if facility_id not in self.facility_set:
+                continue
+            
+            kept.append({
+                'id': item.get('id'),
+                'state': item.get('state'),
+                'kind': item.get('kind'),
+                'modified': item.get('modified'),
+                'data': {field: slot_data[field] for field in PROJECTED_SLOT_FIELDS if field in slot_data},
+                '_facility': facility_id
+            })
+        
+        return kept
+    
+    def ingest_items(self, items: List[Dict]) -> List[Dict]:
+        """Pre-filter a page's items and work out each slot's facility and times once, keeping them on the item"""
+        items = self.prefilter_items(items)
+        for item in items:
+            if item.get('data'):
+                slot_facility(item)
+                slot_times(item)
+        return items
+    
+    def next_page_url(self, data: Dict, current_url: str, page_count: int) -> Optional[str]:
+        """Return the URL of the page after `data`, or None when pagination should stop.
+        
+        Must be called before pre-filtering, which may empty a page.
+        """
+        next_page_url = data.get('next')
+        
+        # Check if we've reached the last page according to RPDE spec:
+        # Last page has empty items array AND next matches current URL
+        if (not data.get('items') or len(data.get('items', [])) == 0) and next_page_url == current_url:
+            return None
+        
+        if not next_page_url:
+            return None
+        
+        # Safety check to prevent infinite loops
+        if page_count > self.MAX_PAGES:
+            print(f"Warning: Stopped after {page_count} pages to prevent infinite loop")
+            return None
+        
+        return next_page_url
+    
+    def iter_pages(self, start_url: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """Yield (url, page) for each RPDE page as it arrives, following pagination.
+        
+        With prefetch enabled the request for the next page is sent as soon as
+        its `next` link is known, so it downloads while the caller processes
+        the current page.
+        """
+        current_url = start_url or self.BASE_URL
+        page_count = 0
+        executor = ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        pending = None
+        
         try:
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching slots: {e}")
-            sys.exit(1)
+            while True:
+                if pending is not None:
+                    data = pending.result()
+                    pending = None
+                else:
+                    data = self.fetch_slots(current_url)
+                page_count += 1
+                
+                next_page_url = self.next_page_url(data, current_url, page_count)
+                
+                # Start downloading the next page before this one is filtered
+                if executor and next_page_url:
+                    pending = executor.submit(self.fetch_slots, next_page_url)
+                
+                if 'items' in data:
+                    data['items'] = self.ingest_items(data['items'])
+                
+                yield current_url, data
+                
+                if not next_page_url:
+                    break
+                current_url = next_page_url
+        finally:
+            # Don't leave a request running if the caller stopped early
+            if pending is not None:
+                pending.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+    
+    def iter_slots(self, start_url: Optional[str] = None) -> Iterator[Dict]:
+        """Yield raw feed items page by page without collecting them.
+        
+        Unlike fetch_all_slots this bypasses the slot store, so only one page
+        is held in memory at a time but superseded versions are not merged.
+        """
+        for _, data in self.iter_pages(start_url):
+            yield from data.get('items', [])
+    
+    def sync_start(self) -> Optional[str]:
+        """Where a sync starts: the first recorded page when replaying, otherwise the stored checkpoint"""
+        if self.replay is not None:
+            return self.replay.first_url()
+        return self.store.checkpoint
+    
+    def save_checkpoint(self, checkpoint: Optional[str]):
+        """Store the next sync's starting page and persist the store; replays leave both alone"""
+        if self.replay is not None:
+            return
+        self.store.checkpoint = checkpoint
+        self.store.save()
     
     def fetch_all_slots(self) -> List[Dict]:
-        """Fetch all slots by following RPDE pagination properly"""
-        all_slots = []
-        next_url = None
+        """Fetch all slots by following RPDE pagination properly.
+        
+        Pages are applied to the slot store, so each run only fetches the
+        pages after the stored checkpoint and returns the merged slots. If a
+        page keeps failing, the pages before it are kept and the checkpoint is
+        set to the failed page, so the next call resumes from there.
+        """
+        checkpoint = self.sync_start()
+        
+        try:
+            for url, data in self.iter_pages(checkpoint):
+                # Merge the page into the store (upsert by id, drop deletions)
+                self.store.apply_page(data.get('items', []))
+                
+                # The last page's next link is where the next run picks up from
+                checkpoint = data.get('next') or url
+        except FeedError as e:
+            self.save_checkpoint(e.url)
+            raise
+        
+        self.save_checkpoint(checkpoint)
+        
+        return self.store.slots()
+
+class AsyncPlacesLeisureAPI(PlacesLeisureAPI):
+    """Asyncio interface to the Places Leisure OpenActive API, using aiohttp.
+    
+    Shares the slot store, checkpointing and pre-filtering of PlacesLeisureAPI
+    but fetch_slots, iter_pages and fetch_all_slots are coroutines. Use it as
+    an async context manager so the HTTP session is closed.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        if aiohttp is None:
+            raise ImportError("AsyncPlacesLeisureAPI requires aiohttp: pip install aiohttp")
+        super().__init__(*args, **kwargs)
+        self.async_session: Optional['aiohttp.ClientSession'] = None
+        # Store saves and page cache/recording files are read and written on
+        # this thread so they don't block the event loop. A single worker
+        # keeps them in order and the store on one thread at a time.
+        self.io_executor: Optional[ThreadPoolExecutor] = None
+    
+    def open_session(self) -> None:
+        # The aiohttp session is opened on first use, inside the event loop
+        return None
+    
+    async def __aenter__(self) -> 'AsyncPlacesLeisureAPI':
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    async def close(self):
+        """Close the underlying HTTP session and the I/O thread"""
+        if self.async_session is not None:
+            await self.async_session.close()
+            self.async_session = None
+        if self.io_executor is not None:
+            self.io_executor.shutdown(wait=True)
+            self.io_executor = None
+    
+    async def run_io(self, func: Callable, *args):
+        """Run a blocking disk or store call on the I/O thread and return its result"""
+        if self.io_executor is None:
+            self.io_executor = ThreadPoolExecutor(max_workers=1)
+        return await asyncio.get_running_loop().run_in_executor(self.io_executor, func, *args)
+    
+    async def fetch_slots(self, after_url: Optional[str] = None) -> Dict:
+        """Fetch slots from the API, retrying transient failures.
+        
+        Raises a FeedError subclass once the retries are used up.
+        """
+        url = after_url or self.BASE_URL
+        
+        cached = await self.run_io(self.local_page, url)
+        if cached is not None:
+            return cached
+        
+        if self.async_session is None:
+            self.async_session = aiohttp.ClientSession(
+                headers=REQUEST_HEADERS,
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.async_session.get(url) as response:
+                    error = self.status_error(url, response.status)
+                    if error is None:
+                        body = await response.read()
+                        data = json.loads(body)
+                        await self.run_io(self.received_page, url, data, body)
+                        return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = FeedConnectionError(f"Error fetching slots from {url}: {e!r}", url)
+            except ValueError as e:
+                # Usually a truncated body, so worth another try
+                error = FeedDecodeError(f"Invalid JSON from {url}: {e}", url)
+            
+            if attempt < self.max_retries:
+                delay = self.retry_delay(attempt)
+                print(f"Warning: {error} - retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        
+        raise error
+    
+    async def iter_pages(self, start_url: Optional[str] = None) -> AsyncIterator[Tuple[str, Dict]]:
+        """Yield (url, page) for each RPDE page as it arrives, following pagination"""
+        current_url = start_url or self.BASE_URL
         page_count = 0
+        pending = None
+        
+        try:
+            while True:
+                if pending is not None:
+                    data = await pending
+                    pending = None
+                else:
+                    data = await self.fetch_slots(current_url)
+                page_count += 1
+                
+                next_page_url = self.next_page_url(data, current_url, page_count)
+                
+                # Start downloading the next page before this one is filtered
+                if self.prefetch and next_page_url:
+                    pending = asyncio.ensure_future(self.fetch_slots(next_page_url))
+                
+                if 'items' in data:
+                    data['items'] = self.ingest_items(data['items'])
+                
+                yield current_url, data
+                
+                if not next_page_url:
+                    break
+                current_url = next_page_url
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
+    async def iter_slots(self, start_url: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Yield raw feed items page by page without collecting them"""
+        async for _, data in self.iter_pages(start_url):
+            for item in data.get('items', []):
+                yield item
+    
+    async def fetch_all_slots(self) -> List[Dict]:
+        """Fetch all slots by following RPDE pagination, merging pages into the slot store"""
+        checkpoint = self.sync_start()
+        
+        try:
+            async for url, data in self.iter_pages(checkpoint):
+                # Merge the page into the store (upsert by id, drop deletions)
+                await self.run_io(self.store.apply_page, data.get('items', []))
+                
+                # The last page's next link is where the next run picks up from
+                checkpoint = data.get('next') or url
+        except FeedError as e:
+            # Resume from the failed page next time
+            await self.run_io(self.save_checkpoint, e.url)
+            raise
+        
+        await self.run_io(self.save_checkpoint, checkpoint)
+        
+        return await self.run_io(self.store.slots)
+
+class SlotIndex:
+    """Slots grouped by facility id and sorted by start time.
+    
+    Selecting a facility is a dict lookup, and window queries find their
+    slots by bisection instead of scanning every slot, so each costs
+    O(log n + k). Times are the epoch seconds from slot_times, and matches
+    come back in feed order so court assignment is unchanged. With
+    facility_ids None every facility in the feed is indexed.
+    """
+    
+    def __init__(self, slots: Iterable[Dict], facility_ids: Optional[List[str]] = None):
+        self.facility_ids = facility_ids
+        wanted = set(facility_ids) if facility_ids is not None else None
+        # Per facility: (start, end, feed position, item) sorted by start,
+        # plus the start times alone for bisection
+        self.entries: Dict[str, List[Tuple[int, int, int, Dict]]] = {}
+        self.starts: Dict[str, List[int]] = {}
+        # Longest slot per facility - no slot starting earlier than this
+        # before a window can overlap it
+        self.max_duration: Dict[str, int] = {}
         
-        while True:
-            data = self.fetch_slots(next_url)
-            page_count += 1
+        for position, slot_item in enumerate(slots):
+            if not slot_item.get('data'):
+                continue
             
-            # Add slots to our collection
-            if 'items' in data:
-                all_slots.extend(data['items'])
+            facility_id = slot_facility(slot_item)
+            if facility_id is None or (wanted is not None and facility_id not in wanted):
+                continue
             
-            # Check if we've reached the last page according to RPDE spec:
-            # Last page has empty items array AND next matches current URL
-            current_url = next_url or self.BASE_URL
-            next_page_url = data.get('next')
+            times = slot_times(slot_item)
+            if times is None:
+                continue
             
-            if (not data.get('items') or len(data.get('items', [])) == 0) and next_page_url == current_url:
-                break
+            self.entries.setdefault(facility_id, []).append((times[0], times[1], position, slot_item))
+        
+        for facility_id, entries in self.entries.items():
+            entries.sort(key=lambda entry: (entry[0], entry[2]))
+            self.starts[facility_id] = [entry[0] for entry in entries]
+            self.max_duration[facility_id] = max(slot_end - slot_start for slot_start, slot_end, _, _ in entries)
+    
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.entries.values())
+    
+    def start_times(self, after: int, facility_ids: Optional[Iterable[str]] = None) -> Iterator[int]:
+        """Lazily yield each distinct slot start time at or after `after`, in time order"""
+        streams = []
+        for facility_id in (self.starts if facility_ids is None else facility_ids):
+            starts = self.starts.get(facility_id)
+            if starts:
+                first = bisect.bisect_left(starts, after)
+                streams.append(itertools.islice(starts, first, None))
+        
+        previous = None
+        for start in heapq.merge(*streams):
+            if start != previous:
+                yield start
+                previous = start
+    
+    def overlapping(self, window_start: int, window_end: int,
+                    facility_ids: Optional[Iterable[str]] = None, same_day: bool = True) -> List[Dict]:
+        """Slots starting on window_start's day that overlap the window, in feed order.
+        
+        Only the given facilities are searched, or every indexed facility if
+        None. same_day=False returns overlapping slots starting on any day.
+        """
+        day = window_start // 86400
+        matches = []
+        
+        for facility_id in (self.starts if facility_ids is None else facility_ids):
+            starts = self.starts.get(facility_id)
+            if starts is None:
+                continue
+            entries = self.entries[facility_id]
+            low = bisect.bisect_left(starts, window_start - self.max_duration[facility_id])
+            high = bisect.bisect_left(starts, window_end)
             
-            # Get next page URL
-            next_url = next_page_url
-            if not next_url:
-                break
-                
-            # Safety check to prevent infinite loops
-            if page_count > 1000:
-                print(f"Warning: Stopped after {page_count} pages to prevent infinite loop")
-                break
+            for slot_start, slot_end, position, slot_item in entries[low:high]:
+                if slot_end > window_start and (not same_day or slot_start // 86400 == day):
+                    matches.append((position, slot_item))
+        
+        matches.sort(key=lambda match: match[0])
+        return [slot_item for _, slot_item in matches]
+
+class CourtBitmaps:
+    """One day of court availability as bitmaps over 5-minute quanta.
+    
+    Bit i of a court's bitmap is set when the court is free for the whole
+    quantum starting i * 5 minutes after midnight (feed clock), so questions
+    about several courts or times are bitwise operations on ints. Partly
+    booked slots say some court is free but not which, so they are only
+    counted in `partial`.
+    """
+    
+    QUANTUM_MINUTES = 5
+    QUANTA = 24 * 60 // QUANTUM_MINUTES
+    
+    def __init__(self, target_date: str, courts: Dict[str, int], partial: int = 0):
+        self.date = target_date
+        self.courts = courts
+        self.partial = partial
+    
+    @classmethod
+    def interval(cls, start_seconds: int, end_seconds: int) -> int:
+        """Bitmap of the quanta lying wholly between two offsets from midnight, in seconds"""
+        quantum_seconds = cls.QUANTUM_MINUTES * 60
+        first = max(0, -(-start_seconds // quantum_seconds))
+        last = min(cls.QUANTA, end_seconds // quantum_seconds)
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+    
+    @classmethod
+    def span(cls, start_time: str, minutes: int) -> int:
+        """Bitmap covering `minutes` minutes from an HH:MM time.
+        
+        Empty if the span runs past midnight, as the bitmaps hold no data
+        for the next day, so nothing counts as free for it.
+        """
+        start = datetime.strptime(start_time, "%H:%M")
+        start_seconds = (start.hour * 60 + start.minute) * 60
+        end_seconds = start_seconds + minutes * 60
+        if end_seconds > cls.QUANTA * cls.QUANTUM_MINUTES * 60:
+            return 0
+        return cls.interval(start_seconds, end_seconds)
+    
+    def any_free(self) -> int:
+        """Quanta where at least one court is free"""
+        bitmap = self.partial
+        for bits in self.courts.values():
+            bitmap |= bits
+        return bitmap
+    
+    def all_free(self) -> int:
+        """Quanta where every court is free"""
+        if not self.courts:
+            return 0
+        bitmap = -1
+        for bits in self.courts.values():
+            bitmap &= bits
+        return bitmap
+    
+    def free_courts(self, start_time: str, minutes: int) -> List[str]:
+        """Courts free for the whole of `minutes` minutes from start_time.
+        
+        Stricter than a check, which counts a court as free in a window if
+        any free slot of it overlaps the window.
+        """
+        mask = self.span(start_time, minutes)
+        return sorted(court_name for court_name, bits in self.courts.items() if mask and bits & mask == mask)
+    
+    def free_for(self, start_time: str, minutes: int, court: Optional[str] = None) -> bool:
+        """Check if one court (the given one, or any) is free for `minutes` minutes from start_time"""
+        if court is not None:
+            mask = self.span(start_time, minutes)
+            return bool(mask) and self.courts.get(court, 0) & mask == mask
+        return bool(self.free_courts(start_time, minutes))
+    
+    def periods(self, bitmap: int) -> List[Tuple[str, str]]:
+        """(start, end) HH:MM times of each run of set bits in a bitmap"""
+        periods = []
+        quantum = 0
+        while bitmap >> quantum:
+            if not (bitmap >> quantum) & 1:
+                quantum += 1
+                continue
+            run_end = quantum
+            while (bitmap >> run_end) & 1:
+                run_end += 1
+            periods.append(tuple(
+                f"{minutes // 60:02d}:{minutes % 60:02d}"
+                for minutes in (quantum * self.QUANTUM_MINUTES, run_end * self.QUANTUM_MINUTES)
+            ))
+            quantum = run_end
+        return periods
+
+class FreeRuns:
+    """Minutes of continuous availability from each 5-minute quantum, per court and day.
+    
+    Built from CourtBitmaps, so "how long is this court free from 18:00" or
+    "is there an 80-minute block at 18:00" are single list lookups. The
+    runs follow the checker's slot store: a change to a slot marks its day
+    stale if that day was built, and only stale days are rebuilt, on their
+    next query.
+    Partly booked slots don't identify a court and are not counted.
+    """
+    
+    def __init__(self, checker: 'SquashAvailabilityChecker'):
+        self.checker = checker
+        self.store = checker.api.store
+        # date -> court -> minutes free from each quantum
+        self.days: Dict[str, Dict[str, List[int]]] = {}
+        # date -> court -> (start quantum, minutes) of its longest free block
+        self.longest: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self.stale: set = set()
+        self.store.add_listener(self.slot_changed)
+    
+    def slot_changed(self, old_item: Optional[Dict], new_item: Optional[Dict]):
+        """Store listener: mark built days holding a changed slot's old or new version stale.
+        
+        Days not built yet are left alone; they are built on their first query.
+        """
+        for slot_item in (old_item, new_item):
+            if not slot_item or not slot_item.get('data') or slot_facility(slot_item) not in self.checker.facility_set:
+                continue
+            times = slot_times(slot_item)
+            if times is None:
+                continue
+            slot_date = (datetime(1970, 1, 1) + timedelta(seconds=times[0])).strftime("%Y-%m-%d")
+            if slot_date in self.days:
+                self.stale.add(slot_date)
+    
+    @staticmethod
+    def run_lengths(bitmap: int) -> List[int]:
+        """Minutes of continuous set bits starting at each quantum of a CourtBitmaps bitmap"""
+        runs = [0] * (CourtBitmaps.QUANTA + 1)
+        for quantum in range(CourtBitmaps.QUANTA - 1, -1, -1):
+            if (bitmap >> quantum) & 1:
+                runs[quantum] = runs[quantum + 1] + CourtBitmaps.QUANTUM_MINUTES
+        return runs[:CourtBitmaps.QUANTA]
+    
+    def refresh(self, *target_dates: str):
+        """Rebuild the given dates if not built yet, along with every stale date, in one pass over the store"""
+        dates = self.stale | {target_date for target_date in target_dates if target_date not in self.days}
+        if not dates:
+            return
         
-        return all_slots
+        index = self.checker.build_index(self.checker.filter_squash_slots_by_dates(self.store.slots(), dates))
+        for target_date in dates:
+            bitmaps = self.checker.court_bitmaps(index, target_date)
+            runs = {court_name: self.run_lengths(bits) for court_name, bits in bitmaps.courts.items()}
+            self.days[target_date] = runs
+            self.longest[target_date] = {
+                court_name: max(enumerate(court_runs), key=lambda run: (run[1], -run[0]))
+                for court_name, court_runs in runs.items()
+            }
+        self.stale -= dates
+    
+    def day(self, target_date: str) -> Dict[str, List[int]]:
+        """Per court, the minutes free from each quantum of a date"""
+        self.refresh(target_date)
+        return self.days[target_date]
+    
+    def free_minutes(self, target_date: str, start_time: str, court: Optional[str] = None) -> int:
+        """Minutes a court (the given one, or the best) stays free from start_time.
+        
+        Times between quanta are rounded down to the quantum they fall in,
+        less the minutes of it already gone.
+        """
+        start = datetime.strptime(start_time, "%H:%M")
+        quantum, elapsed = divmod(start.hour * 60 + start.minute, CourtBitmaps.QUANTUM_MINUTES)
+        runs = self.day(target_date)
+        courts = [runs.get(court)] if court is not None else list(runs.values())
+        return max((court_runs[quantum] - elapsed for court_runs in courts if court_runs and court_runs[quantum]), default=0)
+    
+    def longest_free(self, target_date: str, court: Optional[str] = None) -> Optional[Tuple[str, str, int]]:
+        """(court, start, minutes) of the longest free block on a date, or None if nothing is free"""
+        self.refresh(target_date)
+        candidates = [
+            (minutes, court_name, quantum)
+            for court_name, (quantum, minutes) in self.longest[target_date].items()
+            if minutes and (court is None or court_name == court)
+        ]
+        if not candidates:
+            return None
+        
+        minutes, court_name, quantum = max(candidates, key=lambda candidate: (candidate[0], -candidate[2]))
+        start = quantum * CourtBitmaps.QUANTUM_MINUTES
+        return court_name, f"{start // 60:02d}:{start % 60:02d}", minutes
+    
+    def starts_with(self, target_date: str, minutes: int, court: Optional[str] = None) -> List[str]:
+        """Every HH:MM start on a date where a court (the given one, or any) is free for `minutes` minutes"""
+        runs = self.day(target_date)
+        courts = [runs.get(court, [])] if court is not None else list(runs.values())
+        
+        starts = []
+        for quantum in range(CourtBitmaps.QUANTA):
+            if any(court_runs and court_runs[quantum] >= minutes for court_runs in courts):
+                start = quantum * CourtBitmaps.QUANTUM_MINUTES
+                starts.append(f"{start // 60:02d}:{start % 60:02d}")
+        return starts
 
 class SquashAvailabilityChecker:
     """Main class for checking squash court availability"""
     
-    def __init__(self):
-        self.api = PlacesLeisureAPI()
+    def __init__(self, checkpoint_path: Optional[str] = None, streaming: bool = False,
+                 facility_ids: Optional[List[str]] = None, prefetch: bool = False,
+                 max_retries: int = 3, page_cache: Optional[PageCache] = None,
+                 snapshot_path: Optional[str] = None, recording: Optional[FeedRecording] = None,
+                 replay: Optional[FeedRecording] = None, base_url: Optional[str] = None,
+                 slot_minutes: int = 40, api_class: type = PlacesLeisureAPI):
+        if slot_minutes <= 0:
+            raise ValueError(f"slot_minutes must be positive, got {slot_minutes}")
+        
+        self.facility_ids = facility_ids or SQUASH_FACILITY_IDS
+        self.facility_set = set(self.facility_ids)
+        # The API drops items for other facilities as each page is decoded;
+        # api_class=AsyncPlacesLeisureAPI gives a client with coroutine fetches
+        self.api = api_class(checkpoint_path=checkpoint_path, facility_ids=self.facility_ids,
+                              prefetch=prefetch, max_retries=max_retries, page_cache=page_cache,
+                              recording=recording, replay=replay, base_url=base_url)
+        # Stream the feed page by page instead of materialising every slot
+        self.streaming = streaming
+        # Length of the main slot and of each slot before or after it
+        self.slot_minutes = slot_minutes
+        # Created on first use by free_runs()
+        self._free_runs: Optional[FreeRuns] = None
+        
+        # Fast start: seed an empty store from a snapshot so only the pages
+        # published since it was written need to be fetched
+        if snapshot_path and self.api.store.checkpoint is None:
+            self.api.store.load_snapshot(snapshot_path)
+    
+    def write_snapshot(self, path: str) -> int:
+        """Bring the slot store up to date and write it to a snapshot file, returning the slot count"""
+        self.api.fetch_all_slots()
+        self.api.store.write_snapshot(path)
+        return len(self.api.store)
     
     def parse_datetime(self, date_str: str, time_str: str) -> datetime:
         """Parse date and time strings into datetime object"""
@@ -92,61 +1237,107 @@ class SquashAvailabilityChecker:
         """Check if two time periods overlap"""
         return (slot_start < check_end) and (slot_end > check_start)
     
-    def filter_squash_slots_by_time(self, slots: List[Dict], target_date: str, 
+    def target_seconds(self, target_date: str, time_str: str) -> int:
+        """Epoch seconds of a target date and time, on the same clock as slot_times"""
+        return calendar.timegm(self.parse_datetime(target_date, time_str).timetuple())
+    
+    def filter_squash_slots_by_date(self, slots: Iterable[Dict], target_date: str) -> Iterator[Dict]:
+        """Lazily yield squash slots starting on the target date"""
+        return self.filter_squash_slots_by_dates(slots, [target_date])
+    
+    def filter_squash_slots_by_dates(self, slots: Iterable[Dict], target_dates: Iterable[str]) -> Iterator[Dict]:
+        """Lazily yield squash slots starting on any of the target dates"""
+        days = {self.target_seconds(target_date, "00:00") // 86400 for target_date in target_dates}
+        
+        for slot_item in slots:
+            if not slot_item.get('data') or slot_facility(slot_item) not in self.facility_set:
+                continue
+            
+            times = slot_times(slot_item)
+            if times is not None and times[0] // 86400 in days:
+                yield slot_item
+    
+    def build_index(self, slots: Iterable[Dict]) -> SlotIndex:
+        """Index squash slots by facility and start time for repeated window queries"""
+        return SlotIndex(slots, self.facility_ids)
+    
+    def filter_squash_slots_by_time(self, slots: Iterable[Dict], target_date: str, 
                                    start_time: str, end_time: str) -> List[Dict]:
-        """Filter squash slots by target date and time range"""
-        target_start = self.parse_datetime(target_date, start_time)
-        target_end = self.parse_datetime(target_date, end_time)
+        """Filter squash slots by target date and time range.
         
-        # Squash facility identifier for Alfreton Leisure Centre
-        squash_facility_ids = [
-            "041A000005"   # Alfreton Leisure Centre Squash
-        ]
+        `slots` can be a SlotIndex from build_index, which answers the query
+        by bisection instead of checking every slot.
+        """
+        return self.filter_squash_slots_by_windows(slots, target_date, [(start_time, end_time)])[0]
+    
+    def filter_squash_slots_by_windows(self, slots: Iterable[Dict], target_date: str,
+                                       windows: List[Tuple[str, str]]) -> List[List[Dict]]:
+        """Filter squash slots into any number of (start, end) windows on the target date in one pass.
+        
+        Returns one list per window, in the order given, with each slot in
+        every window it overlaps. A window ending before it starts, such as
+        ("23:20", "00:00"), ends on the next day. `slots` can be a SlotIndex,
+        in which case only the slots within the span of the windows are
+        looked at.
+        """
+        # Compared in epoch seconds, with the target times on the feed's clock
+        bounds = []
+        for start, end in windows:
+            window_start, window_end = self.target_seconds(target_date, start), self.target_seconds(target_date, end)
+            bounds.append((window_start, window_end + 86400 if window_end < window_start else window_end))
+        return self.filter_squash_slots_by_bounds(slots, bounds)
+    
+    def filter_squash_slots_by_bounds(self, slots: Iterable[Dict],
+                                      bounds: List[Tuple[int, int]]) -> List[List[Dict]]:
+        """filter_squash_slots_by_windows for windows given as epoch (start, end) seconds.
         
-        filtered_slots = []
+        Like a single window on a date, each window only takes slots starting
+        on the day it starts, so windows can lie on or cross into any day.
+        """
+        filtered = [[] for _ in bounds]
+        if not bounds:
+            return filtered
+        
+        # Windows sorted by start, with the latest end among each prefix, so
+        # each slot only visits the windows that can overlap it
+        order = sorted(range(len(bounds)), key=lambda window: bounds[window][0])
+        starts = [bounds[window][0] for window in order]
+        latest_ends = list(itertools.accumulate((bounds[window][1] for window in order), max))
+        days = {window_start // 86400 for window_start, _ in bounds}
+        
+        if isinstance(slots, SlotIndex):
+            slots = slots.overlapping(starts[0], latest_ends[-1], self.facility_set, same_day=len(days) == 1)
         
         for slot_item in slots:
-            slot_data = slot_item.get('data', {})
-            if not slot_data:
+            if not slot_item.get('data'):
                 continue
             
-            # Check if this is a squash facility by facilityUse identifier
-            facility_use = slot_data.get('facilityUse', '')
-            is_squash = any(facility_id in facility_use for facility_id in squash_facility_ids)
-            
-            if not is_squash:
+            # Check if this is a squash facility by its facility id (extracted when fetched)
+            if slot_facility(slot_item) not in self.facility_set:
                 continue
             
-            # Parse slot start and end times
-            try:
-                slot_start = datetime.fromisoformat(slot_data['startDate'].replace('Z', '+00:00'))
-                slot_end = datetime.fromisoformat(slot_data['endDate'].replace('Z', '+00:00'))
-                
-                # Ensure target_start has timezone info for comparison
-                if target_start.tzinfo is None:
-                    target_start = target_start.replace(tzinfo=slot_start.tzinfo)
-                if target_end.tzinfo is None:
-                    target_end = target_end.replace(tzinfo=slot_end.tzinfo)
-                
-                # Check if slot is on the target date and overlaps with target time
-                if (slot_start.date() == target_start.date() and 
-                    self.time_overlaps(slot_start, slot_end, target_start, target_end)):
-                    filtered_slots.append(slot_item)
-                    
-            except (KeyError, ValueError) as e:
+            # Start and end were parsed when the slot was fetched
+            times = slot_times(slot_item)
+            if times is None or times[0] // 86400 not in days:
                 continue
+            slot_start, slot_end = times
+            slot_day = slot_start // 86400
+            
+            # Windows starting before the slot ends, walked back until none
+            # of the remaining ones can end after the slot starts
+            position = bisect.bisect_left(starts, slot_end)
+            while position > 0 and latest_ends[position - 1] > slot_start:
+                position -= 1
+                window = order[position]
+                if bounds[window][1] > slot_start and bounds[window][0] // 86400 == slot_day:
+                    filtered[window].append(slot_item)
         
-        return filtered_slots
+        return filtered
     
-    def get_squash_court_availability(self, slots: List[Dict]) -> Dict[str, Dict]:
+    def get_squash_court_availability(self, slots: Iterable[Dict]) -> Dict[str, Dict]:
         """Get availability information for squash courts - handles individual court slots"""
         court_info = {}
         
-        # Squash facility identifier for Alfreton Leisure Centre
-        squash_facility_ids = [
-            "041A000005"   # Alfreton Leisure Centre Squash
-        ]
-        
         # Group slots by time to identify individual court slots
         time_slots = {}
         
@@ -155,14 +1346,8 @@ class SquashAvailabilityChecker:
             if not slot_data:
                 continue
             
-            # Get facility information
-            facility_use = slot_data.get('facilityUse', '')
-            
-            # Extract facility ID from URL
-            facility_id = facility_use.split('/')[-1] if '/' in facility_use else facility_use
-            
             # Only include squash facilities
-            if facility_id not in squash_facility_ids:
+            if slot_facility(slot_item) not in self.facility_set:
                 continue
             
             # Group by start time to find individual court slots
@@ -355,24 +1540,342 @@ class SquashAvailabilityChecker:
                 'remaining': remaining_uses
             })
     
+    def with_adjacent_dates(self, target_dates: Iterable[str]) -> List[str]:
+        """The target dates and the days either side, which windows crossing midnight reach into"""
+        dates = set()
+        for target_date in target_dates:
+            day = datetime.strptime(target_date, "%Y-%m-%d")
+            dates.update((day + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in (-1, 0, 1))
+        return sorted(dates)
+    
+    def load_slots(self, *target_dates: str) -> List[Dict]:
+        """Fetch the slots needed to answer queries on the target dates, or on any date if none are given"""
+        if self.streaming:
+            # Consume the feed as a stream, keeping only the handful of squash
+            # slots on the target dates so the windows can be filtered later
+            if target_dates:
+                dates = self.with_adjacent_dates(target_dates)
+                return list(self.filter_squash_slots_by_dates(self.api.iter_slots(), dates))
+            return [slot_item for slot_item in self.api.iter_slots()
+                    if slot_item.get('data') and slot_facility(slot_item) in self.facility_set]
+        return self.api.fetch_all_slots()
+    
     def check_squash_availability(self, target_date: str, start_time: str) -> Tuple[Dict, Dict, str, str, str, str]:
-        """Check squash court availability for main slot and the period before it (40 minutes each)"""
-        from datetime import datetime, timedelta
-        
-        # Calculate time ranges (always 40 minutes)
+        """Check squash court availability for main slot and the period before it (slot_minutes each)"""
+        return self.analyze_slots(self.load_slots(target_date), target_date, start_time)
+    
+    def time_windows(self, start_time: str) -> Tuple[str, str, str, str]:
+        """Main and before window (start, end) times for a start time"""
+        # Calculate time ranges (slot_minutes each, 40 by default)
         main_start = start_time
-        main_end = (datetime.strptime(start_time, "%H:%M") + timedelta(minutes=40)).strftime("%H:%M")
+        main_end = (datetime.strptime(start_time, "%H:%M") + timedelta(minutes=self.slot_minutes)).strftime("%H:%M")
         
-        before_start = (datetime.strptime(start_time, "%H:%M") - timedelta(minutes=40)).strftime("%H:%M")
+        before_start = (datetime.strptime(start_time, "%H:%M") - timedelta(minutes=self.slot_minutes)).strftime("%H:%M")
         before_end = start_time
         
-        all_slots = self.api.fetch_all_slots()
+        return main_start, main_end, before_start, before_end
+    
+    def check_chain(self, before_slots: int, after_slots: int):
+        """Raise ValueError unless both slot counts of a chain are zero or more"""
+        if before_slots < 0 or after_slots < 0:
+            raise ValueError(f"Slot counts can't be negative, got before_slots={before_slots}, after_slots={after_slots}")
+    
+    def chain_windows(self, start_time: str, before_slots: int = 1,
+                      after_slots: int = 0) -> List[Tuple[str, str, str]]:
+        """(role, start, end) for each slot of a chain around a start time, in time order.
+        
+        The chain is before_slots consecutive slots before the main slot, the
+        main slot ("main") and after_slots slots after it, each slot_minutes long.
+        """
+        self.check_chain(before_slots, after_slots)
+        main_start = datetime.strptime(start_time, "%H:%M")
+        length = timedelta(minutes=self.slot_minutes)
+        
+        windows = []
+        for offset in range(-before_slots, after_slots + 1):
+            role = "before" if offset < 0 else "main" if offset == 0 else "after"
+            window_start = main_start + offset * length
+            windows.append((role, window_start.strftime("%H:%M"), (window_start + length).strftime("%H:%M")))
+        return windows
+    
+    def window_bounds(self, target_date: str, start_time: str, before_slots: int = 1,
+                      after_slots: int = 0) -> List[Tuple[int, int]]:
+        """Epoch (start, end) seconds of each chain_windows slot, keeping the date across midnight"""
+        self.check_chain(before_slots, after_slots)
+        main_start = self.target_seconds(target_date, start_time)
+        length = self.slot_minutes * 60
+        return [(main_start + offset * length, main_start + (offset + 1) * length)
+                for offset in range(-before_slots, after_slots + 1)]
+    
+    def day_slots(self, all_slots: Iterable[Dict], target_date: str) -> List[Dict]:
+        """Squash slots starting on the target date, from a slot list or a SlotIndex"""
+        if isinstance(all_slots, SlotIndex):
+            day_start = self.target_seconds(target_date, "00:00")
+            return all_slots.overlapping(day_start, day_start + 86400, self.facility_set)
+        return list(self.filter_squash_slots_by_date(all_slots, target_date))
+    
+    def slot_start_times(self, slots: Iterable[Dict]) -> List[str]:
+        """Sorted HH:MM times at which the given slots start"""
+        return sorted({
+            f"{start % 86400 // 3600:02d}:{start % 3600 // 60:02d}"
+            for start, _ in filter(None, map(slot_times, slots))
+        })
+    
+    def day_availability(self, all_slots: Iterable[Dict], target_date: str,
+                         start_times: Optional[List[str]] = None) -> Dict[str, Tuple[Dict, Dict]]:
+        """Main and before court information for each start time on a date, by start time.
+        
+        The start times default to every time a squash slot starts on the
+        day. All the windows are filtered in one sweep over the slots, and a
+        window shared by two start times (one's main is the next one's
+        before) is only worked out once.
+        """
+        if not isinstance(all_slots, (SlotIndex, list)):
+            all_slots = list(all_slots)
+        if start_times is None:
+            start_times = self.slot_start_times(self.day_slots(all_slots, target_date))
+        
+        windows: Dict[Tuple[int, int], int] = {}
+        time_windows = []
+        for start_time in start_times:
+            before_bounds, main_bounds = self.window_bounds(target_date, start_time)
+            main = windows.setdefault(main_bounds, len(windows))
+            before = windows.setdefault(before_bounds, len(windows))
+            time_windows.append((start_time, main, before))
+        
+        # Filtered from all the slots, as windows can cross midnight into the next or previous day
+        court_infos = [
+            self.get_squash_court_availability(window_slots)
+            for window_slots in self.filter_squash_slots_by_bounds(all_slots, list(windows))
+        ]
+        
+        return {start_time: (court_infos[main], court_infos[before]) for start_time, main, before in time_windows}
+    
+    def day_grid(self, target_date: str, all_slots: Optional[Iterable[Dict]] = None) -> Dict:
+        """Main and before slot availability for every slot start time on a date, as a compact table.
+        
+        Each row is [start, main courts free, before courts free], the counts
+        check_availability_programmatic reports for that start time. The
+        slots are fetched unless all_slots is given.
+        """
+        if all_slots is None:
+            all_slots = self.load_slots(target_date)
+        
+        return {
+            "date": target_date,
+            "columns": ["start", "main_available", "before_available"],
+            "rows": [
+                [start_time, count_available_courts(main_court_info), count_available_courts(before_court_info)]
+                for start_time, (main_court_info, before_court_info) in self.day_availability(all_slots, target_date).items()
+            ]
+        }
+    
+    def availability_grid(self, start_date: str, days: int = 14,
+                          all_slots: Optional[Iterable[Dict]] = None) -> Dict:
+        """Per-court main and before slot availability over a range of dates, as dense arrays.
+        
+        "main" and "before" are indexed [day][start time][court] along
+        "dates", "times" and "courts", holding 1 where that court is free.
+        Partly booked slots don't say which court is free, so they are kept
+        out of "courts" and reported in "main_partial" and "before_partial",
+        indexed [day][start time], holding 1 where some court is free.
+        Times are every slot start time seen in the range and are checked
+        on every day. The slots are fetched once (unless all_slots is given)
+        and indexed once for every day.
+        """
+        first_day = datetime.strptime(start_date, "%Y-%m-%d")
+        dates = [(first_day + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days)]
         
-        # Check main slot availability
-        main_slots = self.filter_squash_slots_by_time(all_slots, target_date, main_start, main_end)
+        if all_slots is None:
+            all_slots = self.load_slots(*dates)
+        index = all_slots if isinstance(all_slots, SlotIndex) else self.build_index(all_slots)
         
-        # Check before slot availability
-        before_slots = self.filter_squash_slots_by_time(all_slots, target_date, before_start, before_end)
+        day_slots = [self.day_slots(index, target_date) for target_date in dates]
+        times = sorted({start_time for slots in day_slots for start_time in self.slot_start_times(slots)})
+        availability = [self.day_availability(index, target_date, times) for target_date in dates]
+        
+        courts = sorted({
+            court_name
+            for day in availability
+            for court_infos in day.values()
+            for court_info in court_infos
+            for court_name, court_data in court_info.items()
+            if court_data['id'] != 'partial_booking'
+        })
+        
+        def court_flags(court_info: Dict) -> List[int]:
+            return [int(court_info.get(court_name, {}).get('available', False)) for court_name in courts]
+        
+        def partial_flag(court_info: Dict) -> int:
+            return int(any(court_data['available'] for court_data in court_info.values()
+                           if court_data['id'] == 'partial_booking'))
+        
+        return {
+            "dates": dates,
+            "times": times,
+            "courts": courts,
+            "main": [[court_flags(day[start_time][0]) for start_time in times] for day in availability],
+            "before": [[court_flags(day[start_time][1]) for start_time in times] for day in availability],
+            "main_partial": [[partial_flag(day[start_time][0]) for start_time in times] for day in availability],
+            "before_partial": [[partial_flag(day[start_time][1]) for start_time in times] for day in availability]
+        }
+    
+    def find_next_available(self, after: datetime, before_window: bool = True,
+                            all_slots: Optional[Iterable[Dict]] = None) -> Optional[Tuple[str, Tuple[Dict, Dict, str, str, str, str]]]:
+        """Find the first slot start time at or after `after` with a court free.
+        
+        With before_window a court must also be free in the slot before.
+        Start times are taken from a SlotIndex in time order and the search
+        stops at the first match, returning (date, analyze_slots result), or
+        None if no start time qualifies. Naive datetimes are on the feed's
+        clock (UTC). The slots are fetched unless all_slots is given.
+        """
+        if all_slots is None:
+            all_slots = self.load_slots()
+        index = all_slots if isinstance(all_slots, SlotIndex) else self.build_index(all_slots)
+        
+        if after.tzinfo is not None:
+            after = after.astimezone(timezone.utc).replace(tzinfo=None)
+        
+        for start in index.start_times(calendar.timegm(after.timetuple()), self.facility_set):
+            start_at = datetime(1970, 1, 1) + timedelta(seconds=start)
+            target_date, start_time = start_at.strftime("%Y-%m-%d"), start_at.strftime("%H:%M")
+            
+            availability = self.analyze_slots(index, target_date, start_time)
+            main_court_info, before_court_info = availability[:2]
+            if count_available_courts(main_court_info) and (not before_window or count_available_courts(before_court_info)):
+                return target_date, availability
+        
+        return None
+    
+    def analyze_chain(self, all_slots: Iterable[Dict], target_date: str, start_time: str,
+                      before_slots: int = 1, after_slots: int = 0) -> List[Dict]:
+        """Court availability for every slot of a chain (see chain_windows), filtered in one pass.
+        
+        Returns one {"role", "start", "end", "available", "court_info"} dict
+        per slot in time order, where "available" counts the free courts.
+        """
+        windows = self.chain_windows(start_time, before_slots, after_slots)
+        window_slots = self.filter_squash_slots_by_bounds(
+            all_slots, self.window_bounds(target_date, start_time, before_slots, after_slots)
+        )
+        
+        chain = []
+        for (role, window_start, window_end), slots in zip(windows, window_slots):
+            court_info = self.get_squash_court_availability(slots)
+            chain.append({
+                "role": role,
+                "start": window_start,
+                "end": window_end,
+                "available": count_available_courts(court_info),
+                "court_info": court_info
+            })
+        return chain
+    
+    def court_bitsets(self, chain: List[Dict]) -> Dict[str, int]:
+        """Per court, a bitset with bit i set when the court is free in slot i of a chain.
+        
+        Partial bookings only say that some court is free, not which, so
+        they never count towards a specific court.
+        """
+        bitsets: Dict[str, int] = {}
+        for position, window in enumerate(chain):
+            for court_name, court_data in window["court_info"].items():
+                if court_data['available'] and court_data['id'] != 'partial_booking':
+                    bitsets[court_name] = bitsets.get(court_name, 0) | (1 << position)
+        return bitsets
+    
+    def continuous_courts(self, chain: List[Dict]) -> List[str]:
+        """Courts free in every slot of a chain from analyze_chain, so one court covers the whole stretch"""
+        every_slot = (1 << len(chain)) - 1
+        return sorted(court_name for court_name, bits in self.court_bitsets(chain).items() if bits == every_slot)
+    
+    def availability_result(self, all_slots: Iterable[Dict], target_date: str, start_time: str,
+                            before_slots: int = 1, after_slots: int = 0, same_court: bool = False) -> Dict:
+        """The check_availability_programmatic result for a start time, from already fetched slots.
+        
+        Unless the chain is the usual one slot before the main slot, the
+        result also has "chain" (from analyze_chain) and "chain_available",
+        true when every slot in the chain has a free court. same_court adds
+        both, plus "continuous_courts": the courts free for the whole chain.
+        """
+        if before_slots == 1 and after_slots == 0 and not same_court:
+            availability = self.analyze_slots(all_slots, target_date, start_time)
+            return build_availability_result(target_date, *availability, slot_minutes=self.slot_minutes)
+        
+        # The main and before fields come from the chain, which always
+        # includes the slot before the main one, so the slots are filtered once
+        leading = max(before_slots, 1)
+        chain = self.analyze_chain(all_slots, target_date, start_time, leading, after_slots)
+        main, before = chain[leading], chain[leading - 1]
+        result = build_availability_result(target_date, main["court_info"], before["court_info"],
+                                           main["start"], main["end"], before["start"], before["end"],
+                                           slot_minutes=self.slot_minutes)
+        
+        chain = chain[leading - before_slots:]
+        result["chain"] = chain
+        result["chain_available"] = all(window["available"] for window in chain)
+        if same_court:
+            result["continuous_courts"] = self.continuous_courts(chain)
+        return result
+    
+    def free_runs(self) -> FreeRuns:
+        """Free-run lengths for the slots in the store, kept up to date as later fetches change it.
+        
+        Call api.fetch_all_slots() to bring the store up to date first; not
+        available in streaming mode, which doesn't use the store.
+        """
+        if self._free_runs is None:
+            self._free_runs = FreeRuns(self)
+        return self._free_runs
+    
+    def court_bitmaps(self, all_slots: Iterable[Dict], target_date: str) -> CourtBitmaps:
+        """Build each court's free time on a date as a CourtBitmaps.
+        
+        The day's slots are grouped by start time and each group goes
+        through get_squash_court_availability once, so courts are assigned
+        exactly as in a check; every window query after that is bit
+        arithmetic instead of building court dictionaries.
+        """
+        day_start = self.target_seconds(target_date, "00:00")
+        
+        # Slots sharing a start time are the individual courts of that time
+        time_slots: Dict[str, List[Dict]] = {}
+        for slot_item in self.day_slots(all_slots, target_date):
+            time_slots.setdefault(slot_item['data'].get('startDate', ''), []).append(slot_item)
+        
+        courts: Dict[str, int] = {}
+        partial = 0
+        for slot_group in time_slots.values():
+            for court_name, court_data in self.get_squash_court_availability(slot_group).items():
+                is_partial = court_data['id'] == 'partial_booking'
+                if not is_partial:
+                    courts.setdefault(court_name, 0)
+                
+                for slot in court_data['slots']:
+                    if slot['remaining'] <= 0:
+                        continue
+                    try:
+                        bits = CourtBitmaps.interval(feed_seconds(slot['start']) - day_start,
+                                                     feed_seconds(slot['end']) - day_start)
+                    except (AttributeError, TypeError, ValueError):
+                        continue
+                    
+                    if is_partial:
+                        partial |= bits
+                    else:
+                        courts[court_name] |= bits
+        
+        return CourtBitmaps(target_date, courts, partial)
+    
+    def analyze_slots(self, all_slots: Iterable[Dict], target_date: str,
+                      start_time: str) -> Tuple[Dict, Dict, str, str, str, str]:
+        """Work out main and before slot availability from already fetched slots or a SlotIndex"""
+        main_start, main_end, before_start, before_end = self.time_windows(start_time)
+        
+        # Both windows are filtered in a single pass over the slots
+        before_bounds, main_bounds = self.window_bounds(target_date, start_time)
+        main_slots, before_slots = self.filter_squash_slots_by_bounds(all_slots, [main_bounds, before_bounds])
         
         main_court_info = self.get_squash_court_availability(main_slots)
         before_court_info = self.get_squash_court_availability(before_slots)
@@ -480,90 +1983,329 @@ class SquashAvailabilityChecker:
         
         print(f"\n{'='*60}")
 
-def check_availability_programmatic(target_date: str, start_time: str) -> Dict:
+def count_available_courts(court_info: Dict) -> int:
+    """Number of courts marked available in court information from get_squash_court_availability"""
+    return sum(1 for court_data in court_info.values() if court_data['available'])
+
+def build_availability_result(target_date: str, main_court_info: Dict, before_court_info: Dict,
+                              main_start: str, main_end: str, before_start: str, before_end: str,
+                              slot_minutes: int = 40) -> Dict:
+    """Turn court availability for the main and before slots into the result dictionary"""
+    # Count available slots for both time periods
+    main_available = count_available_courts(main_court_info)
+    before_available = count_available_courts(before_court_info)
+    
+    # Determine success and message
+    if before_available > 0:
+        if before_available == 1:
+            message = "There is one court free before your booking, see link to find out which court is free"
+        else:
+            message = f"There are {before_available} courts free before your booking"
+        success = True
+    else:
+        message = "There are no courts free before your booking, no point getting there early!"
+        success = False
+    
+    # Build booking URL with proper parameters
+    from datetime import datetime, timezone
+    
+    # Parse the before slot start time as local time, then convert to UTC
+    before_datetime = datetime.strptime(f"{target_date}T{before_start}:00", "%Y-%m-%dT%H:%M:%S")
+    # Convert local time to UTC properly (assuming system local timezone)
+    before_datetime_utc = before_datetime.replace(tzinfo=datetime.now().astimezone().tzinfo).astimezone(timezone.utc)
+    
+    # Calculate previous activity date (one slot before)
+    previous_datetime = before_datetime_utc - timedelta(minutes=slot_minutes)
+    
+    # Format dates for URL
+    activity_date = before_datetime_utc.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    previous_activity_date = previous_datetime.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    
+    # Build the booking URL with parameters
+    booking_url = f"https://placesleisure.gladstonego.cloud/book/calendar/041A000005?activityDate={activity_date}&previousActivityDate={previous_activity_date}"
+    
+    # Return structured result
+    return {
+        "success": success,
+        "message": message,
+        "main_slot_available": main_available,
+        "before_slot_available": before_available,
+        "booking_url": booking_url,
+        "main_court_info": main_court_info,
+        "before_court_info": before_court_info,
+        "time_slots": {
+            "main": {"start": main_start, "end": main_end},
+            "before": {"start": before_start, "end": before_end}
+        }
+    }
+
+def build_error_result(error: Exception) -> Dict:
+    """Result dictionary returned when a check fails"""
+    return {
+        "success": False,
+        "message": f"Error checking availability: {str(error)}",
+        "booking_url": "https://placesleisure.gladstonego.cloud/book/calendar/041A000005",
+        "error": str(error)
+    }
+
+def check_availability_programmatic(target_date: str, start_time: str,
+                                    before_slots: int = 1,
+                                    after_slots: int = 0,
+                                    same_court: bool = False,
+                                    **checker_options) -> Dict:
     """
     Programmatic interface to check squash availability.
     Returns structured data instead of printing to stdout.
-    """
-    checker = SquashAvailabilityChecker()
+    before_slots/after_slots set how many consecutive slots to check before
+    and after the main one; any chain other than one slot before adds
+    "chain" and "chain_available". same_court=True also adds
+    "continuous_courts", the courts free for the whole chain.
     
+    checker_options are passed to SquashAvailabilityChecker. Pass
+    checkpoint_path to sync the feed incrementally between calls, or
+    streaming=True to keep only one feed page in memory at a time.
+    facility_ids overrides which facilities count as squash courts, and
+    prefetch=True downloads the next feed page while the current one is processed.
+    Each feed page is retried up to max_retries times before giving up, and
+    page_cache serves feed pages that can no longer change from disk.
+    snapshot_path seeds the slots from a snapshot file for a fast cold start.
+    recording saves every feed page received, and replay serves the feed
+    from such a recording without touching the network. base_url points
+    the client at another feed, such as a local rpde_stub_server.py, and
+    slot_minutes sets the slot length.
+    """
     try:
-        main_court_info, before_court_info, main_start, main_end, before_start, before_end = checker.check_squash_availability(target_date, start_time)
+        checker = SquashAvailabilityChecker(**checker_options)
+        checker.check_chain(before_slots, after_slots)
         
-        # Count available slots for both time periods
-        main_available = sum(1 for court_data in main_court_info.values() if court_data['available'])
-        before_available = sum(1 for court_data in before_court_info.values() if court_data['available'])
+        return checker.availability_result(checker.load_slots(target_date), target_date, start_time,
+                                           before_slots, after_slots, same_court)
+    except Exception as e:
+        return build_error_result(e)
+
+def check_availability_many(target_date: str, start_times: Iterable[str],
+                            before_slots: int = 1,
+                            after_slots: int = 0,
+                            same_court: bool = False,
+                            **checker_options) -> List[Dict]:
+    """
+    Check several start times on one date with a single feed fetch.
+    Takes the same options as check_availability_programmatic and returns
+    its result dictionary for each start time, in order. If the feed
+    can't be fetched every entry is the error result.
+    """
+    start_times = list(start_times)
+    try:
+        checker = SquashAvailabilityChecker(**checker_options)
+        checker.check_chain(before_slots, after_slots)
         
-        # Determine success and message
-        if before_available > 0:
-            if before_available == 1:
-                message = "There is one court free before your booking, see link to find out which court is free"
-            else:
-                message = f"There are {before_available} courts free before your booking"
-            success = True
-        else:
-            message = "There are no courts free before your booking, no point getting there early!"
-            success = False
-        
-        # Build booking URL with proper parameters
-        from datetime import datetime, timezone
-        
-        # Parse the before slot start time as local time, then convert to UTC
-        before_datetime = datetime.strptime(f"{target_date}T{before_start}:00", "%Y-%m-%dT%H:%M:%S")
-        # Convert local time to UTC properly (assuming system local timezone)
-        before_datetime_utc = before_datetime.replace(tzinfo=datetime.now().astimezone().tzinfo).astimezone(timezone.utc)
-        
-        # Calculate previous activity date (40 minutes before)
-        previous_datetime = before_datetime_utc - timedelta(minutes=40)
-        
-        # Format dates for URL
-        activity_date = before_datetime_utc.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        previous_activity_date = previous_datetime.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        
-        # Build the booking URL with parameters
-        booking_url = f"https://placesleisure.gladstonego.cloud/book/calendar/041A000005?activityDate={activity_date}&previousActivityDate={previous_activity_date}"
-        
-        # Return structured result
-        result = {
-            "success": success,
-            "message": message,
-            "main_slot_available": main_available,
-            "before_slot_available": before_available,
-            "booking_url": booking_url,
-            "main_court_info": main_court_info,
-            "before_court_info": before_court_info,
-            "time_slots": {
-                "main": {"start": main_start, "end": main_end},
-                "before": {"start": before_start, "end": before_end}
-            }
-        }
+        index = checker.build_index(checker.load_slots(target_date))
+        return [checker.availability_result(index, target_date, start_time, before_slots, after_slots, same_court)
+                for start_time in start_times]
+    except Exception as e:
+        return [build_error_result(e) for _ in start_times]
+
+def day_grid(target_date: str, **checker_options) -> Dict:
+    """
+    Main and before slot availability for every start time on a date.
+    Takes the same options as check_availability_programmatic and returns
+    {"date", "columns", "rows"}, one row per slot start time, or the
+    error result if the feed can't be fetched.
+    """
+    try:
+        checker = SquashAvailabilityChecker(**checker_options)
         
-        return result
+        return checker.day_grid(target_date)
+    except Exception as e:
+        return build_error_result(e)
+
+def availability_grid(start_date: str, days: int = 14, **checker_options) -> Dict:
+    """
+    Per-court main and before slot availability for `days` dates from start_date.
+    Takes the same options as check_availability_programmatic and returns
+    dense [day][start time][court] arrays of 0/1 (see
+    SquashAvailabilityChecker.availability_grid), or the error result if
+    the feed can't be fetched.
+    """
+    try:
+        checker = SquashAvailabilityChecker(**checker_options)
         
+        return checker.availability_grid(start_date, days)
     except Exception as e:
-        error_result = {
+        return build_error_result(e)
+
+def find_next_available(after: Optional[datetime] = None, before_window: bool = True,
+                        **checker_options) -> Dict:
+    """
+    Find the first start time at or after `after` (default now) with a free court.
+    With before_window=True a court must also be free in the slot
+    before. Takes the same options as check_availability_programmatic and
+    returns its result dictionary for the time found, plus its "date".
+    If nothing is free "success" is False and "date" is None.
+    """
+    after = after or datetime.now(timezone.utc)
+    try:
+        checker = SquashAvailabilityChecker(**checker_options)
+        
+        found = checker.find_next_available(after, before_window=before_window)
+    except Exception as e:
+        return build_error_result(e)
+    
+    if found is None:
+        return {
             "success": False,
-            "message": f"Error checking availability: {str(e)}",
+            "message": f"No squash courts free after {after.strftime('%Y-%m-%d %H:%M')}",
             "booking_url": "https://placesleisure.gladstonego.cloud/book/calendar/041A000005",
-            "error": str(e)
+            "date": None
         }
-        return error_result
+    
+    target_date, availability = found
+    return {**build_availability_result(target_date, *availability, slot_minutes=checker.slot_minutes),
+            "date": target_date}
+
+async def check_availability_async(target_date: str, start_time: str,
+                                   before_slots: int = 1,
+                                   after_slots: int = 0,
+                                   same_court: bool = False,
+                                   **checker_options) -> Dict:
+    """
+    Asyncio version of check_availability_programmatic.
+    Fetches the feed with AsyncPlacesLeisureAPI so the event loop is never
+    blocked, and returns the same result dictionary.
+    """
+    try:
+        checker = SquashAvailabilityChecker(api_class=AsyncPlacesLeisureAPI, **checker_options)
+        checker.check_chain(before_slots, after_slots)
+        
+        async with checker.api as api:
+            if checker.streaming:
+                # Keep only the squash slots on the target date (and the days
+                # either side, for windows crossing midnight) from each page
+                dates = checker.with_adjacent_dates([target_date])
+                all_slots = []
+                async for _, data in api.iter_pages():
+                    all_slots.extend(checker.filter_squash_slots_by_dates(data.get('items', []), dates))
+            else:
+                all_slots = await api.fetch_all_slots()
+        
+        return checker.availability_result(all_slots, target_date, start_time, before_slots, after_slots,
+                                           same_court)
+    except Exception as e:
+        return build_error_result(e)
+
+def positive_int(value: str) -> int:
+    """argparse type for a whole number above zero"""
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be above zero, got {value}")
+    return number
+
+def non_negative_int(value: str) -> int:
+    """argparse type for a whole number of zero or more"""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"can't be negative, got {value}")
+    return number
 
 def main():
     parser = argparse.ArgumentParser(description='Check Places Leisure squash court availability')
+    parser.add_argument('command', nargs='?', choices=['check', 'grid', 'next', 'snapshot'], default='check',
+                        help='check availability (default), show every start time on --date (grid), find the '
+                             'first free court from --date --start-time (next), or write the synced slots to the '
+                             '--snapshot file')
     parser.add_argument('--date', help='Target date (YYYY-MM-DD). Defaults to today if not provided')
-    parser.add_argument('--start-time', required=True, help='Start time (HH:MM) - checks 40-minute slot and 40 minutes before')
+    parser.add_argument('--start-time', help='Start time (HH:MM) - checks the slot starting then and the slot before it')
+    parser.add_argument('--slot-minutes', type=positive_int, default=40, help='Length of each slot in minutes (default: 40)')
+    parser.add_argument('--before-slots', type=non_negative_int, default=1, help='Consecutive slots to check before the main slot (default: 1)')
+    parser.add_argument('--after-slots', type=non_negative_int, default=0, help='Consecutive slots to check after the main slot (default: 0)')
+    parser.add_argument('--same-court', action='store_true', help='Also list courts free for every checked slot')
+    parser.add_argument('--main-only', action='store_true', help='next: don\'t require a free court in the slot before')
+    parser.add_argument('--days', type=int, help='grid: show per-court availability for this many days from --date')
+    parser.add_argument('--snapshot', help='Snapshot file to start from (check) or to write (snapshot)')
+    parser.add_argument('--facility-id', action='append', dest='facility_ids',
+                        help=f'Facility identifier to check; repeat for several (default: {", ".join(SQUASH_FACILITY_IDS)})')
+    parser.add_argument('--cache-dir', help='Directory for caching feed pages that can no longer change')
+    parser.add_argument('--cache-size', type=int, default=256, help='Maximum page cache size in MB (default: 256)')
+    parser.add_argument('--cache-compression', choices=['gzip', 'lzma'], help='Compress cached pages')
+    parser.add_argument('--base-url', help='Feed URL to read instead of the Places Leisure live slots feed')
+    parser.add_argument('--record', metavar='DIR', help='Save every feed page received to DIR')
+    parser.add_argument('--replay', metavar='DIR', help='Serve the feed from pages saved with --record, without using the network')
+    parser.add_argument('--retries', type=int, default=3, help='Times to retry a failing feed page before giving up (default: 3)')
+    parser.add_argument('--prefetch', action='store_true', help='Download the next feed page while the current one is processed')
+    parser.add_argument('--stream', action='store_true', help='Stream the feed page by page to keep memory use low (ignores --state-file)')
+    parser.add_argument('--state-file', help='Path to keep the RPDE checkpoint and known slots between runs, so only new feed pages are fetched. Only the checked facilities are stored, so use one file per facility set')
     
     args = parser.parse_args()
     
+    if args.command == 'snapshot' and not args.snapshot:
+        parser.error('the snapshot command requires --snapshot PATH')
+    if args.command == 'check' and not args.start_time:
+        parser.error('the following arguments are required: --start-time')
+    if args.replay and args.state_file:
+        parser.error('--replay always starts from the first recorded page, so it can\'t be used with --state-file')
+    
     # Default to today's date if not provided
+    date_given = args.date is not None
     if args.date is None:
-        from datetime import datetime
         args.date = datetime.now().strftime('%Y-%m-%d')
     
+    page_cache = None
+    if args.cache_dir:
+        page_cache = PageCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024,
+                               compression=args.cache_compression)
+    
+    checker_options = dict(checkpoint_path=args.state_file, facility_ids=args.facility_ids,
+                           prefetch=args.prefetch, max_retries=args.retries, page_cache=page_cache,
+                           recording=FeedRecording(args.record) if args.record else None,
+                           replay=FeedRecording(args.replay) if args.replay else None,
+                           base_url=args.base_url, slot_minutes=args.slot_minutes)
+    
+    if args.command == 'snapshot':
+        checker = SquashAvailabilityChecker(**checker_options)
+        try:
+            slot_count = checker.write_snapshot(args.snapshot)
+        except FeedError as e:
+            print(f"Error writing snapshot: {e}")
+            sys.exit(1)
+        print(json.dumps({"snapshot": args.snapshot, "slots": slot_count,
+                          "checkpoint": checker.api.store.checkpoint}, indent=2))
+        return
+    
+    # Checks read --snapshot rather than write it
+    checker_options.update(streaming=args.stream, snapshot_path=args.snapshot)
+    
+    if args.command == 'next':
+        # Search from --date --start-time, the start of --date, or now on the feed's clock
+        if date_given or args.start_time is not None:
+            after = datetime.strptime(f"{args.date} {args.start_time or '00:00'}", "%Y-%m-%d %H:%M")
+        else:
+            after = datetime.now(timezone.utc)
+        result = find_next_available(after, before_window=not args.main_only, **checker_options)
+        print(json.dumps(result, indent=2))
+        
+        if 'error' in result:
+            sys.exit(1)
+        return
+    
+    if args.command == 'grid':
+        if args.days:
+            result = availability_grid(args.date, args.days, **checker_options)
+        else:
+            result = day_grid(args.date, **checker_options)
+        print(json.dumps(result, indent=2))
+        
+        if 'error' in result:
+            sys.exit(1)
+        return
+    
     # Use the programmatic interface and print the result
-    result = check_availability_programmatic(args.date, args.start_time)
+    result = check_availability_programmatic(args.date, args.start_time, before_slots=args.before_slots,
+                                             after_slots=args.after_slots, same_court=args.same_court,
+                                             **checker_options)
     print(json.dumps(result, indent=2))
+    
+    if 'error' in result:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
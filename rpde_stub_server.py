@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Local RPDE stub server for the Places Leisure live slots feed
+
+Serves a synthetic feed, or the items of a feed recorded with --record, using
+proper RPDE pagination: pages are ordered by (modified, id), each `next` link
+continues after the last item, and the last page has no items and a `next`
+link equal to its own URL. Latency, page size, error rate and item churn can
+be tuned, so the feed client can be load-tested without touching the real
+operator.
+
+Usage:
+    python rpde_stub_server.py --items 20000 --facilities 20 --page-size 500 --latency 0.05
+    python rpde_stub_server.py --recording recordings/2026-02-03 --churn 10
+    python check_squash_availability.py --start-time 18:00 --base-url http://127.0.0.1:8000/feed
+"""
+
+import argparse
+import bisect
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from check_squash_availability import FeedRecording, SlotStore
+from synthetic_feed import generate_slots
+
+
+def recorded_items(directory: str) -> List[Dict]:
+    """Return the latest version of every item in a --record directory"""
+    recording = FeedRecording(directory)
+    latest = {}
+    for page in recording.pages:
+        body = json.loads(recording.load(page['url']))
+        for item in body.get('items', []):
+            existing = latest.get(item.get('id'))
+            if existing is None or SlotStore.modified_key(item) >= SlotStore.modified_key(existing):
+                latest[item.get('id')] = item
+    return list(latest.values())
+
+
+class StubFeed:
+    """An RPDE feed held in memory, ordered by (modified, id)"""
+
+    def __init__(self, items: List[Dict], page_size: int = 500, latency: float = 0.0,
+                 error_rate: float = 0.0, churn: int = 0, seed: Optional[int] = None):
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.churn = churn
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        ordered = sorted(items, key=self.item_key)
+        self.keys: List[Tuple] = [self.item_key(item) for item in ordered]
+        self.items: List[Dict] = ordered
+        self.last_modified = max((key[0] for key in self.keys if isinstance(key[0], int)), default=0)
+
+        # Encoded pages and whether each is the last page, by page URL;
+        # cleared whenever churn changes the feed
+        self.bodies: Dict[str, Tuple[bytes, bool]] = {}
+
+    @staticmethod
+    def item_key(item: Dict) -> Tuple:
+        return (SlotStore.modified_key(item), str(item.get('id')))
+
+    def page(self, base_url: str, after: Optional[Tuple]) -> Dict:
+        """Build the page of items after the (modified, id) position `after`"""
+        start = bisect.bisect_right(self.keys, after) if after is not None else 0
+        items = self.items[start:start + self.page_size]
+
+        if items:
+            modified, item_id = self.item_key(items[-1])
+            next_url = f"{base_url}?{urlencode({'afterTimestamp': modified, 'afterId': item_id})}"
+        elif after is not None:
+            # Last page: its next link is its own URL
+            next_url = f"{base_url}?{urlencode({'afterTimestamp': after[0], 'afterId': after[1]})}"
+        else:
+            next_url = base_url
+
+        return {'next': next_url, 'items': items, 'license': 'https://creativecommons.org/licenses/by/4.0/'}
+
+    def body(self, base_url: str, query: str, after: Optional[Tuple]) -> bytes:
+        """Encoded page for a request, reusing earlier encodings while the feed is unchanged"""
+        url = f"{base_url}?{query}"
+        with self.lock:
+            cached = self.bodies.get(url)
+            if cached is None:
+                page = self.page(base_url, after)
+                cached = (json.dumps(page).encode('utf-8'), not page['items'])
+                self.bodies[url] = cached
+
+            body, is_last_page = cached
+            if is_last_page:
+                self.apply_churn()
+        return body
+
+    def apply_churn(self):
+        """Republish `churn` random items as new versions; about 1 in 10 become deletions.
+
+        Called each time a client reaches the end of the feed, so the next
+        poll of the last page finds new items, as on a live feed.
+        """
+        if not self.churn or not self.items:
+            return
+
+        for _ in range(self.churn):
+            item = self.items[self.random.randrange(len(self.items))]
+            if item.get('state') != 'deleted' and self.random.random() >= 0.1:
+                new_item = json.loads(json.dumps(item))
+                new_item['state'] = 'updated'
+                if 'data' in new_item:
+                    new_item['data']['remainingUses'] = 1 - int(bool(new_item['data'].get('remainingUses', 0)))
+            else:
+                new_item = {'id': item.get('id'), 'state': 'deleted', 'kind': item.get('kind')}
+            self.replace(new_item)
+
+    def replace(self, new_item: Dict):
+        """Swap in a new version of an item (or a new item) at the end of the feed.
+
+        Its `modified` is set past every other item, so clients that have
+        reached the end of the feed pick it up on their next poll.
+        """
+        item_id = str(new_item.get('id'))
+        for index, key in enumerate(self.keys):
+            if key[1] == item_id:
+                del self.items[index]
+                del self.keys[index]
+                break
+
+        self.last_modified += 1
+        new_item = {**new_item, 'modified': self.last_modified}
+        self.items.append(new_item)
+        self.keys.append(self.item_key(new_item))
+        self.bodies.clear()
+
+    def publish(self, *new_items: Dict):
+        """Publish new versions of items from another thread, e.g. a test"""
+        with self.lock:
+            for new_item in new_items:
+                self.replace(new_item)
+
+
+class StubFeedHandler(BaseHTTPRequestHandler):
+    """Serves StubFeed pages at /feed"""
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        feed = self.server.feed
+        parsed = urlparse(self.path)
+
+        if parsed.path != '/feed':
+            self.send_error(404)
+            return
+
+        if feed.latency:
+            time.sleep(feed.latency)
+
+        if feed.error_rate and feed.random.random() < feed.error_rate:
+            self.send_error(503, 'Injected error')
+            return
+
+        params = parse_qs(parsed.query)
+        after = None
+        if 'afterTimestamp' in params and 'afterId' in params:
+            modified = params['afterTimestamp'][0]
+            after = (int(modified) if modified.lstrip('-').isdigit() else modified, params['afterId'][0])
+
+        # Build links from the Host header so they work however the server is reached
+        host = self.headers.get('Host') or '%s:%s' % self.server.server_address[:2]
+        body = feed.body(f"http://{host}/feed", parsed.query, after)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_server(feed: StubFeed, host: str = '127.0.0.1', port: int = 0,
+                      verbose: bool = False) -> ThreadingHTTPServer:
+    """Serve `feed` on a background thread; the feed URL is in `server.url`"""
+    server = ThreadingHTTPServer((host, port), StubFeedHandler)
+    server.daemon_threads = True
+    server.feed = feed
+    server.verbose = verbose
+    server.url = f"http://{host}:{server.server_address[1]}/feed"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local RPDE live slots feed for benchmarks and tests')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--items', type=int, default=10000, help='Number of synthetic items to serve')
+    parser.add_argument('--facilities', type=int, default=50, help='Facilities in the synthetic feed (default: 50)')
+    parser.add_argument('--recording', metavar='DIR', help='Serve the items of a feed saved with --record instead')
+    parser.add_argument('--page-size', type=int, default=500, help='Items per page (default: 500)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay before each response, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 503')
+    parser.add_argument('--churn', type=int, default=0, help='Items republished each time a client reaches the last page')
+    parser.add_argument('--seed', type=int, help='Random seed for errors and churn')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    args = parser.parse_args()
+
+    if args.recording:
+        items = recorded_items(args.recording)
+    else:
+        items = list(generate_slots(facilities=args.facilities, days=None, limit=args.items, seed=args.seed or 0))
+    feed = StubFeed(items, page_size=args.page_size, latency=args.latency,
+                    error_rate=args.error_rate, churn=args.churn, seed=args.seed)
+    server = start_stub_server(feed, args.host, args.port, verbose=args.verbose)
+
+    print(f"Serving {len(items)} items at {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Synthetic OpenActive slot feed generator
+
+Produces slot items shaped like the Places Leisure live slots feed - the
+`facilityUse`, `startDate`/`endDate`, `remainingUses`, `offers` and
+`beta:sportsActivityLocation` fields read by the availability checker - for
+any number of facilities and days. Items are generated lazily, so feeds of
+tens of millions of items can be written without holding them in memory.
+
+The first facility is always the real Alfreton squash facility, so the
+checker finds courts in every generated feed.
+
+Usage:
+    python synthetic_feed.py --facilities 200 --days 28 --recording feeds/synthetic
+    python synthetic_feed.py --items 10000000 --jsonl feeds/10m.jsonl
+"""
+
+import argparse
+import json
+import os
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from check_squash_availability import FeedRecording, SQUASH_FACILITY_IDS
+
+FACILITY_USE_URL = "https://opendata.leisurecloud.live/api/feeds/PlacesLeisure-live-facility-uses"
+
+# How a time on one facility is published, with relative weights. Two-court
+# facilities are published either as one slot covering both courts or as one
+# slot per court, and the single-slot form is also used for partly booked
+# times (remainingUses 0 with a price), as on the real feed.
+SLOT_PATTERNS = (
+    ('per_court', 45),
+    ('both_free', 25),
+    ('both_booked', 15),
+    ('partially_booked', 15)
+)
+
+
+def facility_ids(count: int) -> List[str]:
+    """Facility identifiers, starting with the real squash facility"""
+    ids = list(SQUASH_FACILITY_IDS[:1])
+    centre = 1
+    while len(ids) < count:
+        for number in range(1, 9):
+            facility_id = f"{centre:03d}A{number:06d}"
+            if facility_id not in ids and len(ids) < count:
+                ids.append(facility_id)
+        centre += 1
+    return ids
+
+
+def court_locations(facility_id: str, courts: int) -> List[Dict]:
+    """The beta:sportsActivityLocation list for a facility"""
+    if facility_id in SQUASH_FACILITY_IDS:
+        prefix, name = facility_id[:3] + 'ZSQU', 'Squash Court'
+    else:
+        prefix, name = facility_id[:3] + 'ZCRT', 'Court'
+    return [
+        {'@type': 'Place', 'identifier': f"{prefix}{court:03d}", 'name': f"{name} {court}"}
+        for court in range(1, courts + 1)
+    ]
+
+
+def generate_slots(facilities: int = 50, days: Optional[int] = 14, start_date: Optional[date] = None,
+                   courts: int = 2, slot_minutes: int = 40, open_time: str = "07:00",
+                   close_time: str = "22:00", price: float = 10.25, seed: int = 0,
+                   limit: Optional[int] = None) -> Iterator[Dict]:
+    """Yield RPDE slot items day by day, in increasing `modified` order.
+
+    Each facility publishes a slot every `slot_minutes` between `open_time`
+    and `close_time`. With days=None, days keep coming until `limit` items
+    have been produced.
+    """
+    rng = random.Random(seed)
+    start_date = start_date or date.today()
+    patterns = [name for name, _ in SLOT_PATTERNS]
+    weights = [weight for _, weight in SLOT_PATTERNS]
+
+    ids = facility_ids(facilities)
+    facility_uses = {facility_id: f"{FACILITY_USE_URL}/{facility_id}" for facility_id in ids}
+    locations = {facility_id: court_locations(facility_id, courts) for facility_id in ids}
+
+    open_at = datetime.strptime(open_time, "%H:%M")
+    close_at = datetime.strptime(close_time, "%H:%M")
+    times_per_day = max(0, int((close_at - open_at).total_seconds() // 60) // slot_minutes)
+    duration = f"PT{slot_minutes}M"
+
+    produced = 0
+    day = 0
+    while days is None or day < days:
+        day_start = datetime.combine(start_date + timedelta(days=day), open_at.time())
+
+        for facility_id in ids:
+            for slot_index in range(times_per_day):
+                slot_start = day_start + timedelta(minutes=slot_index * slot_minutes)
+                slot_end = slot_start + timedelta(minutes=slot_minutes)
+                start_iso = slot_start.strftime("%Y-%m-%dT%H:%M:%SZ")
+                end_iso = slot_end.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+                pattern = rng.choices(patterns, weights)[0]
+                if pattern == 'per_court' and courts > 1:
+                    # One item per court; free courts carry the price
+                    published = []
+                    for court in range(courts):
+                        remaining = rng.randint(0, 1)
+                        published.append((remaining, price if remaining else 0))
+                elif pattern == 'both_booked':
+                    published = [(0, 0)]
+                elif pattern == 'partially_booked':
+                    published = [(0, price)]
+                else:
+                    published = [(courts, price)]
+
+                for court, (remaining, offer_price) in enumerate(published, 1):
+                    produced += 1
+                    item_id = f"{facility_id}-{slot_start:%Y%m%d%H%M}-{court}"
+                    yield {
+                        'id': item_id,
+                        'state': 'updated',
+                        'kind': 'Slot',
+                        'modified': produced,
+                        'data': {
+                            '@type': 'Slot',
+                            'identifier': item_id,
+                            'facilityUse': facility_uses[facility_id],
+                            'startDate': start_iso,
+                            'endDate': end_iso,
+                            'duration': duration,
+                            'remainingUses': remaining,
+                            'maximumUses': courts if len(published) == 1 else 1,
+                            'offers': [{'@type': 'Offer', 'price': offer_price, 'priceCurrency': 'GBP'}],
+                            'beta:sportsActivityLocation': locations[facility_id]
+                        }
+                    }
+
+                    if limit is not None and produced >= limit:
+                        return
+        day += 1
+
+
+def write_recording(items: Iterator[Dict], directory: str, page_size: int = 500,
+                    base_url: str = "http://synthetic.invalid/feed") -> int:
+    """Write items as RPDE pages in the --record layout, returning the page count.
+
+    The result can be served with --replay or rpde_stub_server.py --recording.
+    """
+    recording = FeedRecording(directory)
+    url = base_url
+    page: List[Dict] = []
+    pages = 0
+
+    def flush(page_items: List[Dict], page_url: str) -> str:
+        if page_items:
+            last = page_items[-1]
+            next_url = f"{base_url}?afterTimestamp={last['modified']}&afterId={last['id']}"
+        else:
+            next_url = page_url
+        body = json.dumps({'next': next_url, 'items': page_items}).encode('utf-8')
+        recording.record(page_url, body, save_index=False)
+        return next_url
+
+    for item in items:
+        page.append(item)
+        if len(page) >= page_size:
+            url = flush(page, url)
+            page = []
+            pages += 1
+
+    if page:
+        url = flush(page, url)
+        pages += 1
+
+    # Last page: no items and a next link back to itself
+    flush([], url)
+    recording.save_index()
+    return pages + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic OpenActive slot feed')
+    parser.add_argument('--facilities', type=int, default=50, help='Number of facilities (default: 50)')
+    parser.add_argument('--days', type=int, default=14, help='Number of days from --start-date (default: 14)')
+    parser.add_argument('--items', type=int, help='Stop after this many items, adding days as needed')
+    parser.add_argument('--start-date', help='First day (YYYY-MM-DD). Defaults to today')
+    parser.add_argument('--courts', type=int, default=2, help='Courts per facility (default: 2)')
+    parser.add_argument('--slot-minutes', type=int, default=40, help='Slot length in minutes (default: 40)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--page-size', type=int, default=500, help='Items per page for --recording (default: 500)')
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--recording', metavar='DIR', help='Write RPDE pages usable with --replay')
+    output.add_argument('--jsonl', metavar='PATH', help='Write one item per line')
+
+    args = parser.parse_args()
+
+    start_date = datetime.strptime(args.start_date, "%Y-%m-%d").date() if args.start_date else None
+    items = generate_slots(facilities=args.facilities, days=None if args.items else args.days,
+                           start_date=start_date, courts=args.courts, slot_minutes=args.slot_minutes,
+                           seed=args.seed, limit=args.items)
+
+    if args.recording:
+        pages = write_recording(items, args.recording, page_size=args.page_size)
+        print(json.dumps({"recording": args.recording, "pages": pages}, indent=2))
+    else:
+        directory = os.path.dirname(os.path.abspath(args.jsonl))
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        with open(args.jsonl, 'w', encoding='utf-8') as f:
+            for item in items:
+                f.write(json.dumps(item))
+                f.write('\n')
+                count += 1
+        print(json.dumps({"jsonl": args.jsonl, "items": count}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
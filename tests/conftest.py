@@ -0,0 +1,83 @@
+"""Shared fixtures: synthetic slot items and a local stub RPDE server"""
+
+import os
+import sys
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from check_squash_availability import PlacesLeisureAPI, facility_id_of  # noqa: E402
+from rpde_stub_server import StubFeed, start_stub_server  # noqa: E402
+from synthetic_feed import FACILITY_USE_URL, court_locations, generate_slots  # noqa: E402
+
+
+def slot_item(facility_id: str, start: str, minutes: int = 40, remaining: int = 1, court: int = 1) -> Dict:
+    """A one-court slot item for a facility, starting at a 'YYYY-MM-DD HH:MM' time"""
+    start_at = datetime.strptime(start, "%Y-%m-%d %H:%M")
+    end_at = start_at + timedelta(minutes=minutes)
+    item_id = f"{facility_id}-{start[:10]}-{start[11:16]}-{court}"
+    return {
+        'id': item_id,
+        'state': 'updated',
+        'kind': 'Slot',
+        'modified': 1,
+        'data': {
+            '@type': 'Slot',
+            'identifier': item_id,
+            'facilityUse': f"{FACILITY_USE_URL}/{facility_id}",
+            'startDate': start_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            'endDate': end_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            'duration': f"PT{minutes}M",
+            'remainingUses': remaining,
+            'maximumUses': 1,
+            'offers': [{'@type': 'Offer', 'price': 10.25 if remaining else 0, 'priceCurrency': 'GBP'}],
+            'beta:sportsActivityLocation': court_locations(facility_id, 2)[court - 1:court]
+        }
+    }
+
+
+@pytest.fixture
+def make_slot() -> Callable[..., Dict]:
+    return slot_item
+
+
+@pytest.fixture
+def live_items() -> Callable[..., Dict[str, Dict]]:
+    """The items a fully synced store should hold, by id"""
+    def items(feed: StubFeed, facility_ids=None) -> Dict[str, Dict]:
+        return {
+            item['id']: item for item in feed.items
+            if item.get('state') != 'deleted'
+            and (facility_ids is None or facility_id_of(item['data']['facilityUse']) in facility_ids)
+        }
+    return items
+
+
+@pytest.fixture
+def synthetic_items() -> List[Dict]:
+    """Three days of slots for four facilities, the first being the squash courts"""
+    return list(generate_slots(facilities=4, days=3, start_date=date(2026, 2, 3)))
+
+
+@pytest.fixture
+def serve():
+    """Serve a StubFeed on a background thread, returning its feed URL"""
+    servers = []
+
+    def start(feed: StubFeed) -> str:
+        server = start_stub_server(feed)
+        servers.append(server)
+        return server.url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    """Retry failed pages without waiting"""
+    monkeypatch.setattr(PlacesLeisureAPI, 'retry_delay', lambda self, attempt: 0.0)
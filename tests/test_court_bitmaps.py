@@ -0,0 +1,29 @@
+"""CourtBitmaps queries built from a day's slots"""
+
+from check_squash_availability import CourtBitmaps, SquashAvailabilityChecker
+
+
+def test_free_courts_and_periods(make_slot):
+    slots = [make_slot('A', '2026-02-04 18:00'), make_slot('A', '2026-02-04 18:40'),
+             make_slot('A', '2026-02-04 19:20', court=2)]
+    bitmaps = SquashAvailabilityChecker(facility_ids=['A']).court_bitmaps(slots, '2026-02-04')
+
+    assert bitmaps.periods(bitmaps.courts['Court 1']) == [('18:00', '19:20')]
+    assert bitmaps.periods(bitmaps.any_free()) == [('18:00', '20:00')]
+    assert bitmaps.all_free() == 0
+    assert bitmaps.free_courts('18:00', 80) == ['Court 1']
+    assert bitmaps.free_for('18:10', 60, 'Court 1')
+    assert not bitmaps.free_for('18:00', 85)
+    assert not bitmaps.free_for('18:00', 40, 'Court 2')
+
+
+def test_spans_past_midnight_are_not_free(make_slot):
+    bitmaps = SquashAvailabilityChecker(facility_ids=['A']).court_bitmaps(
+        [make_slot('A', '2026-02-04 23:20')], '2026-02-04'
+    )
+
+    assert bitmaps.free_for('23:20', 40)
+    assert not bitmaps.free_for('23:20', 120)
+    assert bitmaps.free_courts('23:30', 600) == []
+    assert CourtBitmaps.span('23:20', 40) != 0
+    assert CourtBitmaps.span('23:20', 45) == 0
@@ -0,0 +1,74 @@
+"""Window filtering and the SlotIndex, checked against the single-window scan"""
+
+from datetime import datetime
+
+import pytest
+
+from check_squash_availability import SlotIndex, SquashAvailabilityChecker, slot_times
+
+WINDOWS = [('07:00', '07:40'), ('07:20', '08:00'), ('12:10', '12:50'), ('17:20', '18:00'),
+           ('18:00', '18:40'), ('18:00', '18:40'), ('21:30', '22:30'), ('23:00', '23:40')]
+
+
+def ids(slots):
+    return [item['id'] for item in slots]
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_windows_match_single_window_filtering(synthetic_items, indexed):
+    checker = SquashAvailabilityChecker()
+    slots = checker.build_index(synthetic_items) if indexed else synthetic_items
+
+    for target_date in ('2026-02-03', '2026-02-04', '2026-02-10'):
+        expected = [ids(checker.filter_squash_slots_by_time(synthetic_items, target_date, start, end))
+                    for start, end in WINDOWS]
+        got = [ids(window_slots) for window_slots in
+               checker.filter_squash_slots_by_windows(slots, target_date, WINDOWS)]
+        assert got == expected
+
+
+def test_slot_index_merges_start_times_across_facilities(make_slot):
+    slots = [make_slot('A', '2026-02-04 09:00'), make_slot('A', '2026-02-04 10:00'),
+             make_slot('A', '2026-02-04 11:00'), make_slot('B', '2026-02-04 18:00'),
+             make_slot('B', '2026-02-04 10:00', court=2)]
+    index = SlotIndex(slots)
+
+    starts = [slot_times(item)[0] for item in slots]
+    assert list(index.start_times(0)) == sorted(set(starts))
+    assert list(index.start_times(starts[1] + 1)) == [starts[2], starts[3]]
+    assert list(index.start_times(0, ['B'])) == [starts[4], starts[3]]
+    assert len(index) == 5
+
+
+def test_find_next_available_searches_every_facility(make_slot):
+    slots = [make_slot('A', '2026-02-04 09:00'), make_slot('A', '2026-02-04 10:00'),
+             make_slot('A', '2026-02-04 11:00'), make_slot('B', '2026-02-04 18:00')]
+    checker = SquashAvailabilityChecker(facility_ids=['A', 'B'])
+
+    target_date, availability = checker.find_next_available(datetime(2026, 2, 4, 8, 0), before_window=False,
+                                                            all_slots=slots)
+    assert (target_date, availability[2]) == ('2026-02-04', '09:00')
+
+    target_date, availability = checker.find_next_available(datetime(2026, 2, 4, 11, 1), before_window=False,
+                                                            all_slots=slots)
+    assert (target_date, availability[2]) == ('2026-02-04', '18:00')
+
+
+def test_windows_crossing_midnight_keep_their_dates(make_slot):
+    slots = [make_slot('A', '2026-02-04 22:40'), make_slot('A', '2026-02-04 23:20'),
+             make_slot('A', '2026-02-05 00:00')]
+    checker = SquashAvailabilityChecker(facility_ids=['A'])
+
+    chain = checker.analyze_chain(slots, '2026-02-04', '22:40', before_slots=0, after_slots=1)
+    assert [(window['start'], window['end'], window['available']) for window in chain] == [
+        ('22:40', '23:20', 1), ('23:20', '00:00', 1)
+    ]
+
+    # The slot before 00:00 is the previous evening's, not 23:20 the same day
+    main, before = checker.analyze_slots(slots, '2026-02-05', '00:00')[:2]
+    assert main and before
+    assert checker.analyze_slots(slots, '2026-02-04', '00:00')[:2] == ({}, {})
+
+    assert [ids(window_slots) for window_slots in
+            checker.filter_squash_slots_by_windows(slots, '2026-02-04', [('23:20', '00:00')])] == [[slots[1]['id']]]
+    assert checker.day_grid('2026-02-05', slots)['rows'] == [['00:00', 1, 1]]
@@ -0,0 +1,57 @@
+"""FreeRuns lookups and how they follow changes to the slot store"""
+
+from check_squash_availability import FreeRuns, SquashAvailabilityChecker, SQUASH_FACILITY_IDS
+from rpde_stub_server import StubFeed
+
+SQUASH = SQUASH_FACILITY_IDS[0]
+
+
+def test_runs_and_lookups(serve, make_slot):
+    # Court 1 is free 18:00-19:20 in two slots, court 2 19:20-20:00
+    feed = StubFeed([make_slot(SQUASH, '2026-02-04 18:00'), make_slot(SQUASH, '2026-02-04 18:40'),
+                     make_slot(SQUASH, '2026-02-04 19:20', court=2),
+                     make_slot(SQUASH, '2026-02-04 20:00', remaining=0, court=2)])
+    checker = SquashAvailabilityChecker(base_url=serve(feed))
+    checker.api.fetch_all_slots()
+    runs = checker.free_runs()
+
+    assert runs.free_minutes('2026-02-04', '18:00') == 80
+    assert runs.free_minutes('2026-02-04', '18:00', 'Squash Court 2') == 0
+    assert runs.free_minutes('2026-02-04', '18:02') == 78
+    assert runs.free_minutes('2026-02-04', '19:20', 'Squash Court 2') == 40
+    assert runs.longest_free('2026-02-04') == ('Squash Court 1', '18:00', 80)
+    assert runs.longest_free('2026-02-04', 'Squash Court 2') == ('Squash Court 2', '19:20', 40)
+    assert runs.starts_with('2026-02-04', 80) == ['18:00']
+    assert runs.starts_with('2026-02-04', 40, 'Squash Court 2') == ['19:20']
+    assert runs.longest_free('2026-02-05') is None
+
+
+def test_only_built_days_go_stale(serve, synthetic_items):
+    feed = StubFeed(synthetic_items, page_size=100)
+    checker = SquashAvailabilityChecker(base_url=serve(feed))
+    checker.api.fetch_all_slots()
+    runs = checker.free_runs()
+    runs.day('2026-02-04')
+
+    def flip(day):
+        item = next(item for item in feed.items
+                    if item.get('data') and item['data']['startDate'].startswith(day)
+                    and item['data']['facilityUse'].endswith(SQUASH))
+        feed.publish({**item, 'data': {**item['data'], 'remainingUses': 1 - item['data']['remainingUses']}})
+
+    # A change on a day that was never built marks nothing
+    flip('2026-02-05')
+    checker.api.fetch_all_slots()
+    assert runs.stale == set()
+    assert set(runs.days) == {'2026-02-04'}
+
+    # A change on a built day marks only that day, rebuilt on the next query
+    runs.day('2026-02-03')
+    flip('2026-02-04')
+    checker.api.fetch_all_slots()
+    assert runs.stale == {'2026-02-04'}
+
+    fresh = FreeRuns(checker)
+    for day in ('2026-02-03', '2026-02-04', '2026-02-05'):
+        assert runs.day(day) == fresh.day(day)
+    assert runs.stale == set()
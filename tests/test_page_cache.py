@@ -0,0 +1,38 @@
+"""PageCache size accounting and unreadable entries"""
+
+from check_squash_availability import PageCache
+
+
+def directory_size(cache):
+    return sum(size for _, size, _ in cache.entries())
+
+
+def test_size_tracks_new_and_replaced_entries(tmp_path):
+    cache = PageCache(str(tmp_path), compression='gzip')
+    cache.put('page-1', b'{"items": [1, 2, 3]}' * 50)
+    assert cache.size() == directory_size(cache)
+
+    cache.put('page-2', b'{"items": []}')
+    cache.put('page-1', b'{"items": [1]}')
+    assert cache.size() == directory_size(cache)
+
+    # A fresh cache over the same directory counts the new file once
+    reopened = PageCache(str(tmp_path), compression='gzip')
+    reopened.put('page-3', b'{"items": [4]}')
+    assert reopened.size() == directory_size(reopened)
+
+
+def test_corrupt_entry_is_dropped(tmp_path):
+    cache = PageCache(str(tmp_path), compression='gzip')
+    cache.put('page', b'{"items": []}' * 100)
+    path = cache.path_for('page')
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:len(data) // 2])
+
+    assert cache.get('page') is None
+    assert cache.entries() == []
+    cache.put('page', b'{"items": []}')
+    assert cache.get('page') == b'{"items": []}'
+    assert cache.size() == directory_size(cache)
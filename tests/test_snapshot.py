@@ -0,0 +1,35 @@
+"""Slot snapshots written on one store and loaded into a fresh one"""
+
+import pytest
+
+from check_squash_availability import PlacesLeisureAPI, open_slot_store
+from rpde_stub_server import StubFeed
+
+
+@pytest.mark.parametrize('state_file', ['slots.json', 'slots.db'])
+def test_snapshot_round_trip(tmp_path, serve, live_items, synthetic_items, state_file):
+    feed = StubFeed(synthetic_items, page_size=50)
+    url = serve(feed)
+
+    warm = PlacesLeisureAPI(base_url=url)
+    warm.fetch_all_slots()
+    snapshot_path = str(tmp_path / 'slots.snap')
+    warm.store.write_snapshot(snapshot_path)
+
+    store = open_slot_store(str(tmp_path / state_file))
+    store.load_snapshot(snapshot_path)
+    assert store.checkpoint == warm.store.checkpoint
+    assert sorted(store.slots(), key=lambda item: item['id']) == sorted(warm.store.slots(), key=lambda item: item['id'])
+
+    # Syncing from the snapshot only picks up what was published since
+    item = next(item for item in feed.items if item.get('data'))
+    feed.publish({'id': item['id'], 'state': 'deleted', 'kind': 'Slot'})
+    synced = PlacesLeisureAPI(store=store, base_url=url).fetch_all_slots()
+    assert {slot_item['id'] for slot_item in synced} == set(live_items(feed))
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / 'slots.snap'
+    path.write_bytes(b'\x80\x04not a snapshot')
+    with pytest.raises(ValueError):
+        open_slot_store().load_snapshot(str(path))
@@ -0,0 +1,133 @@
+"""Incremental sync, deletions and resuming against the stub RPDE server"""
+
+import asyncio
+import random
+
+import pytest
+
+from check_squash_availability import (AsyncPlacesLeisureAPI, FeedHTTPError, FeedRecording, PageCache,
+                                       PlacesLeisureAPI)
+from rpde_stub_server import StubFeed
+
+
+class FailRequests(random.Random):
+    """Random source for StubFeed's error injection that fails chosen requests (1-based)"""
+
+    def __init__(self, failing):
+        super().__init__(0)
+        self.failing = set(failing)
+        self.requests = 0
+
+    def random(self):
+        self.requests += 1
+        return 0.0 if self.requests in self.failing else 1.0
+
+
+@pytest.mark.parametrize('state_file', ['slots.json', 'slots.db'])
+def test_incremental_sync_applies_updates_and_deletions(tmp_path, serve, live_items, synthetic_items, state_file):
+    feed = StubFeed(synthetic_items, page_size=50)
+    url = serve(feed)
+    checkpoint_path = str(tmp_path / state_file)
+
+    api = PlacesLeisureAPI(checkpoint_path=checkpoint_path, base_url=url)
+    api.fetch_all_slots()
+    assert {item['id'] for item in api.store.slots()} == set(live_items(feed))
+
+    # Flip availability on some slots, delete others and add a new one
+    slots = [item for item in feed.items if item.get('data')]
+    updated = [{**item, 'data': {**item['data'], 'remainingUses': 1 - item['data']['remainingUses']}}
+               for item in slots[:10]]
+    deleted = [{'id': item['id'], 'state': 'deleted', 'kind': 'Slot'} for item in slots[10:15]]
+    added = {**slots[20], 'id': 'new-slot'}
+    feed.publish(*updated, *deleted, added)
+
+    # A new client resumes from the saved checkpoint and only reads the new items
+    resumed = PlacesLeisureAPI(checkpoint_path=checkpoint_path, base_url=url)
+    stored = {item['id']: item for item in resumed.fetch_all_slots()}
+
+    expected = live_items(feed)
+    assert set(stored) == set(expected)
+    assert 'new-slot' in stored
+    assert not any(item['id'] in stored for item in deleted)
+    for item in updated:
+        assert stored[item['id']]['data']['remainingUses'] == item['data']['remainingUses']
+
+
+def test_failed_page_resumes_from_that_page(serve, live_items, synthetic_items):
+    feed = StubFeed(synthetic_items, page_size=50, error_rate=0.5)
+    feed.random = FailRequests({3})
+    url = serve(feed)
+
+    api = PlacesLeisureAPI(base_url=url, max_retries=0)
+    with pytest.raises(FeedHTTPError) as error:
+        api.fetch_all_slots()
+
+    # The two pages before the failure are kept and the checkpoint is the failed page
+    assert error.value.status == 503
+    assert api.store.checkpoint == error.value.url
+    assert len(api.store) == 100
+
+    api.fetch_all_slots()
+    assert {item['id'] for item in api.store.slots()} == set(live_items(feed))
+    # Only the failed page onwards was requested again: the rest of the
+    # feed's pages plus the empty last page
+    pages = -(-len(synthetic_items) // 50)
+    assert feed.random.requests == 3 + (pages - 2) + 1
+
+
+def test_record_and_replay(tmp_path, serve, synthetic_items):
+    feed = StubFeed(synthetic_items, page_size=50)
+    url = serve(feed)
+
+    recorded = PlacesLeisureAPI(base_url=url, recording=FeedRecording(str(tmp_path / 'recording'))).fetch_all_slots()
+
+    # The replay never touches the network, so point it at an address nothing serves
+    replay = PlacesLeisureAPI(base_url='http://127.0.0.1:9/feed', replay=FeedRecording(str(tmp_path / 'recording')))
+    replayed = replay.fetch_all_slots()
+
+    assert sorted(replayed, key=lambda item: item['id']) == sorted(recorded, key=lambda item: item['id'])
+    assert len(replayed) == len(synthetic_items)
+
+
+def test_replay_ignores_and_keeps_the_store_checkpoint(tmp_path, serve, synthetic_items):
+    feed = StubFeed(synthetic_items, page_size=50)
+    url = serve(feed)
+    PlacesLeisureAPI(base_url=url, recording=FeedRecording(str(tmp_path / 'recording'))).fetch_all_slots()
+
+    # A store that has already synced past the recording's pages
+    live = PlacesLeisureAPI(base_url=url)
+    live.fetch_all_slots()
+    live.store.checkpoint = f"{url}?afterTimestamp=999999&afterId=x"
+
+    replay = PlacesLeisureAPI(store=live.store, replay=FeedRecording(str(tmp_path / 'recording')))
+    assert len(replay.fetch_all_slots()) == len(synthetic_items)
+    assert live.store.checkpoint == f"{url}?afterTimestamp=999999&afterId=x"
+
+    with pytest.raises(ValueError):
+        PlacesLeisureAPI(checkpoint_path=str(tmp_path / 'slots.json'), replay=FeedRecording(str(tmp_path / 'recording')))
+
+
+@pytest.mark.parametrize('state_file', ['slots.json', 'slots.db'])
+def test_async_sync_saves_store_cache_and_recording(tmp_path, serve, live_items, synthetic_items, state_file):
+    pytest.importorskip('aiohttp')
+    feed = StubFeed(synthetic_items, page_size=50)
+    url = serve(feed)
+    checkpoint_path = str(tmp_path / state_file)
+
+    async def sync():
+        api = AsyncPlacesLeisureAPI(checkpoint_path=checkpoint_path, base_url=url, prefetch=True,
+                                    page_cache=PageCache(str(tmp_path / 'cache')),
+                                    recording=FeedRecording(str(tmp_path / 'recording')))
+        async with api:
+            return await api.fetch_all_slots(), api.store.checkpoint
+
+    slots, checkpoint = asyncio.run(sync())
+    assert {item['id'] for item in slots} == set(live_items(feed))
+
+    # The store, page cache and recording were all written from the I/O thread
+    resumed = PlacesLeisureAPI(checkpoint_path=checkpoint_path, base_url=url)
+    assert resumed.store.checkpoint == checkpoint
+    assert len(resumed.store) == len(slots)
+    assert PageCache(str(tmp_path / 'cache')).entries()
+    replay = PlacesLeisureAPI(replay=FeedRecording(str(tmp_path / 'recording')))
+    assert len(replay.fetch_all_slots()) == len(slots)